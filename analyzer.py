@@ -1,25 +1,86 @@
 """Analyze audio recordings using BirdNET and store predictions in a database."""
 
+import argparse
+import concurrent.futures
+import ctypes
+import ctypes.util
 import fnmatch
+import functools
+import heapq
+import json
+import math
+import multiprocessing
 import os
+import random
+import select
+import signal
+import sqlite3
+import struct
+import sys
+import threading
+from contextlib import closing
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Iterator, Protocol
 
+import numpy as np
 import requests
+import soundfile as sf  # type: ignore
+from scipy.signal import firwin, resample_poly  # type: ignore
 
 # Silences annoying tensorflow logs
 import silence_tensorflow.auto  # type: ignore # noqa: F401 # pylint: disable=unused-import
-from birdnet import SpeciesPredictions, predict_species_within_audio_file  # type: ignore
 from birdnet.location_based_prediction import predict_species_at_location_and_time  # type: ignore
-from birdnet.models.v2m4.model_v2m4_tflite import AudioModelV2M4TFLite
+from birdnet.models.v2m4.model_v2m4_tflite import (  # type: ignore
+    AudioModelV2M4TFLite,
+    MetaModelV2M4TFLite,
+)
+from birdnet.utils import fillup_with_silence, flat_sigmoid  # type: ignore
 from loguru import logger
 
+from web import metrics
+
 
 recordings_dir = Path("recordings")
 recordings_dir.mkdir(exist_ok=True)
+cache_dir = Path("cache")
 
+API_URL = "http://localhost:5000"
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+INOTIFY_EVENT = struct.Struct("iIII")
+WAV_CHUNK = struct.Struct("<4sI")
+WAV_FORMAT = struct.Struct("<HHIIHH")
+WAV_FORMAT_PCM = 1
+WAV_FORMAT_EXTENSIBLE = 0xFFFE
 PREDICTION_BLACKLIST = ["Dog", "Human ", "Engine", "Gun", "Siren", "Power tools"]
-DEFAULT_MODEL = AudioModelV2M4TFLite()
+
+STAGE_SECONDS = metrics.Histogram(
+    "scout_analyzer_stage_seconds",
+    "Seconds spent decoding a recording, running inference on a batch, "
+    "filtering a batch's predictions and delivering detections",
+    ["stage"],
+)
+RECORDINGS_ANALYZED = metrics.Counter(
+    "scout_analyzer_recordings_total", "Recordings analyzed and removed"
+)
+RECORDINGS_BACKLOG = metrics.Gauge(
+    "scout_analyzer_backlog_recordings",
+    "Recordings waiting in the recordings directory",
+)
+RECORDINGS_QUEUED = metrics.Gauge(
+    "scout_analyzer_queued_recordings", "Recordings in the daemon's work queue"
+)
+
+
+@functools.cache
+def get_model(tflite_num_threads: int = 1) -> AudioModelV2M4TFLite:
+    """
+    Load the BirdNET audio model once per process.
+    """
+    logger.info(f"Loading BirdNET audio model ({tflite_num_threads} threads)")
+    return AudioModelV2M4TFLite(tflite_num_threads=tflite_num_threads)
 
 
 def is_invalid_prediction(prediction: str) -> bool:
@@ -29,11 +90,156 @@ def is_invalid_prediction(prediction: str) -> bool:
     return any(prediction.startswith(blacklist) for blacklist in PREDICTION_BLACKLIST)
 
 
-def get_location_species(lat: str, long: str) -> dict:
-    # get calendar week
-    week = datetime.now().isocalendar()[1]
+@functools.lru_cache(maxsize=4)
+def split_labels(labels: tuple[str, ...]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Split `<scientific name>_<common name>` model labels into name arrays over
+    the model's label index, plus a mask of blacklisted labels. Computed once
+    per label set.
+    """
+    scientific_names, common_names = zip(*(label.split("_", 1) for label in labels))
+    blacklisted = np.fromiter(
+        (is_invalid_prediction(name) for name in scientific_names),
+        dtype=bool,
+        count=len(labels),
+    )
+    return (
+        np.array(scientific_names, dtype=object),
+        np.array(common_names, dtype=object),
+        blacklisted,
+    )
+
+
+def get_week(date: datetime) -> int:
+    """
+    BirdNET's week of the year: 4 weeks per month, so 1-48. ISO weeks run up to
+    53 and are rejected by the location model past week 48.
+    """
+    return (date.month - 1) * 4 + min(4, (date.day - 1) // 7 + 1)
+
+
+def next_week_start(date: datetime) -> datetime:
+    if date.day < 22:
+        return date.replace(day=(date.day - 1) // 7 * 7 + 8)
+    if date.month == 12:
+        return date.replace(year=date.year + 1, month=1, day=1)
+    return date.replace(month=date.month + 1, day=1)
+
+
+@functools.cache
+def get_meta_model() -> MetaModelV2M4TFLite:
+    """
+    Load the BirdNET location model once per process. Left to itself,
+    `predict_species_at_location_and_time` loads a new model on every call.
+    """
+    logger.info("Loading BirdNET location model")
+    return MetaModelV2M4TFLite()
+
+
+class LocationSpeciesCache:
+    """
+    Location species keyed by coordinates rounded to ~1 km and BirdNET week.
+
+    Entries live in memory and in a JSON file so restarts don't re-run the
+    location model. A new week is simply a new key; `prefetch` computes the
+    next week's entry in the background so rolling over doesn't stall analysis.
+    """
+
+    def __init__(self, path: Path, keep: int = 4):
+        self.path = path
+        self.keep = keep
+        self._entries: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._prefetching: set[str] = set()
+        self._pending: dict[str, threading.Event] = {}
+        self.load()
+
+    @staticmethod
+    def key(lat: float, long: float, week: int) -> str:
+        return f"{lat:.2f},{long:.2f},{week}"
+
+    def load(self):
+        try:
+            self._entries = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable location cache {self.path}: {e}")
+
+    def save(self):
+        # Only keep the most recent entries, dicts preserve insertion order
+        for key in list(self._entries)[: -self.keep]:
+            del self._entries[key]
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._entries))
+        os.replace(tmp, self.path)
+
+    def get(self, lat: float, long: float, week: int) -> dict:
+        key = self.key(lat, long, week)
+        while True:
+            with self._lock:
+                species = self._entries.get(key)
+                if species is not None:
+                    return species
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    break
+            # Another thread is running the model for this key, use its result
+            pending.wait()
+
+        # The model runs unlocked, so lookups of cached keys never wait on it
+        try:
+            species = predict_location_species(lat, long, week)
+            with self._lock:
+                self._entries[key] = species
+                self.save()
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+        return species
+
+    def prefetch(self, lat: float, long: float, week: int):
+        key = self.key(lat, long, week)
+        with self._lock:
+            if key in self._entries or key in self._prefetching:
+                return
+            self._prefetching.add(key)
+
+        def run():
+            try:
+                self.get(lat, long, week)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.exception(e)
+            finally:
+                self._prefetching.discard(key)
+
+        threading.Thread(target=run, name="location-prefetch", daemon=True).start()
+
+
+location_cache = LocationSpeciesCache(cache_dir / "location_species.json")
+
+
+def get_location_species(lat: str, long: str, prefetch: bool = False) -> dict:
+    """
+    Species likely at the location this week. With `prefetch`, next week's list
+    is computed in the background.
+    """
+    now = datetime.now()
+    if prefetch:
+        location_cache.prefetch(float(lat), float(long), get_week(next_week_start(now)))
+    return location_cache.get(float(lat), float(long), get_week(now))
+
+
+def predict_location_species(lat: float, long: float, week: int) -> dict:
+    """
+    Run the location meta-model.
+    """
     results = predict_species_at_location_and_time(
-        float(lat), float(long), week=week
+        lat, long, week=week, custom_model=get_meta_model()
     ).items()
 
     species = {}
@@ -47,101 +253,1070 @@ def get_location_species(lat: str, long: str) -> dict:
     return species
 
 
-def analyze():
+def parse_recording_name(filename: str) -> tuple[int, int]:
     """
-    Analyze audio recordings in the recordings directory and store predictions in the database.
+    Parse a `<timestamp>_<duration>.wav` recording name into its start timestamp
+    and duration in seconds.
     """
-    session = requests.Session()
+    recording_start, duration = filename.split(".")[0].split("_")
+    return int(recording_start), int(duration)
 
-    # Get config settings
-    response = session.get("http://localhost:5000/api/config", timeout=5)
-    response.raise_for_status()
-    csrftoken = session.cookies.get("csrftoken")
-    config = response.json()
 
-    wav_files = [f for f in os.listdir(recordings_dir) if fnmatch.fnmatch(f, "*.wav")]
-    logger.debug(f"Found {len(wav_files)} recordings to analyze.")
+def list_recordings() -> list[str]:
+    """
+    List WAV recordings waiting in the recordings directory, oldest first.
+    """
+    wav_files = []
+    for filename in os.listdir(recordings_dir):
+        if not fnmatch.fnmatch(filename, "*.wav"):
+            continue
+        try:
+            wav_files.append((parse_recording_name(filename), filename))
+        except ValueError:
+            logger.warning(f"SKIP: unexpected recording name {filename}")
+    return [filename for _, filename in sorted(wav_files)]
 
-    location_species = {}
-    coordinates = None
 
-    location = config["location"]
-    lat = location.get("lat", None)
-    long = location.get("lon", None)
+class ApiClient:
+    """
+    Session against the web app's API used to read config and store detections.
+    """
 
-    if lat and long:
-        location_species = get_location_species(lat, long)
-        coordinates = f"{lat},{long}"
-    else:
-        logger.warning("No location set, skipping location prediction")
+    def __init__(self):
+        self.session = requests.Session()
+        self.config: dict | None = None
 
-    min_audio_confidence = config.get("min_audio_confidence") / 100
-    min_location_confidence = config.get("min_location_confidence") / 100
+    def get_config(self) -> dict:
+        """
+        Fetch the config, falling back to the last one seen while the web app
+        is unreachable so analysis can continue into the spool.
+        """
+        try:
+            response = self.session.get(f"{API_URL}/api/config", timeout=5)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if self.config is None:
+                raise
+            logger.warning(f"Using cached config, fetching it failed: {e}")
+            return self.config
 
-    for filename in wav_files:
-        recording_start, duration = filename.split(".")[0].split("_")
-        logger.info(f"Analyzing recording {filename}")
-        audio_path = recordings_dir / filename
-        predictions = SpeciesPredictions(
-            predict_species_within_audio_file(
-                audio_path,
-                min_confidence=min_audio_confidence,
-                custom_model=DEFAULT_MODEL,
+        self.config = response.json()
+        return self.config
+
+    def send_detections(self, detections: list[dict]):
+        if self.session.cookies.get("csrftoken") is None:
+            self.get_config()
+
+        # Already stored detections are skipped, so resending a batch whose
+        # response was lost is safe
+        with STAGE_SECONDS.time(stage="delivery"):
+            res = self.session.post(
+                f"{API_URL}/api/detections/bulk",
+                data="\n".join(json.dumps(detection) for detection in detections),
+                headers={
+                    "Content-Type": "application/x-ndjson",
+                    "X-CSRFToken": self.session.cookies.get("csrftoken"),
+                },
+                timeout=10,
             )
-        )
+        res.raise_for_status()
 
-        logger.debug(predictions)
-
-        detections = []
-
-        for interval, result in predictions.items():
-            for prediction, audio_confidence in result.items():
-                scientific_name, common_name = prediction.split("_")
-
-                if is_invalid_prediction(scientific_name):
-                    logger.debug(f"SKIP: blacklisted prediction {prediction}")
-                    continue
-
-                loc_confidence = location_species.get(prediction, 0)
-                if loc_confidence < min_location_confidence:
-                    logger.debug(
-                        f"SKIP: Expected min location score {min_location_confidence}, actual: {loc_confidence}"
-                    )
-                    continue
-
-                detections.append(
-                    {
-                        "recording_start": datetime.fromtimestamp(
-                            int(recording_start), tz=timezone.utc
-                        ).isoformat(),
-                        "recording_end": datetime.fromtimestamp(
-                            int(recording_start) + int(duration), tz=timezone.utc
-                        ).isoformat(),
-                        "interval": f"{interval[0]},{interval[1]}",
-                        "scientific_name": scientific_name,
-                        "common_name": common_name,
-                        "audio_confidence": float(audio_confidence),
-                        "location_confidence": float(loc_confidence),
-                        "location": coordinates,
-                    }
-                )
+        report = res.json()
+        for error in report["errors"]:
+            logger.warning(
+                f"Rejected detection {detections[error['line'] - 1]}: "
+                f"{error['errors']}"
+            )
 
+    def post_detections(self, filename: str, detections: list[dict]):
         if len(detections) > 0:
-            res = session.post(
-                "http://localhost:5000/api/detections",
-                json=detections,
-                headers={"X-CSRFToken": csrftoken},
-                timeout=10,
+            self.send_detections(detections)
+
+            logger.info(
+                f"Inserted {len(detections)} predictions for {filename} into the database."
             )
-            res.raise_for_status()
+
+
+class DatabaseClient:
+    """
+    Reads config and stores detections through the web app's models directly,
+    skipping the HTTP API. Only usable when the analyzer runs on the same host
+    as the web app and can open its database.
+    """
+
+    def __init__(self):
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "scout.settings")
+        import django  # pylint: disable=import-outside-toplevel
+
+        django.setup()
+
+    def get_config(self) -> dict:
+        # pylint: disable=import-outside-toplevel
+        from django.forms.models import model_to_dict
+        from web import models, services
+
+        config = models.Config.config.get_config()
+        services.location_service.refresh_in_background(config)
+        return model_to_dict(config)
+
+    def send_detections(self, detections: list[dict]):
+        from web import models  # pylint: disable=import-outside-toplevel
+
+        with STAGE_SECONDS.time(stage="delivery"):
+            models.Detection.detections.create_new(
+                models.Detection.detections.from_payloads(
+                    [
+                        {
+                            **item,
+                            "recording_start": datetime.fromisoformat(
+                                item["recording_start"]
+                            ),
+                            "recording_end": datetime.fromisoformat(
+                                item["recording_end"]
+                            ),
+                        }
+                        for item in detections
+                    ]
+                )
+            )
+
+    def post_detections(self, filename: str, detections: list[dict]):
+        if len(detections) > 0:
+            self.send_detections(detections)
 
             logger.info(
                 f"Inserted {len(detections)} predictions for {filename} into the database."
             )
 
-        os.remove(audio_path)
-        logger.debug(f"Removed recording {filename} after analysis.")
+
+class DetectionSpool:
+    """
+    Durable local queue of detections waiting to be sent to the web app.
+
+    The analyzer only appends to a SQLite file, so a slow or restarting web
+    server never blocks inference. A background sender drains the spool in
+    large batched POSTs, backing off exponentially while the server is down.
+    Detections survive analyzer restarts until they are delivered.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        client: ApiClient | DatabaseClient | None = None,
+        max_batch: int = 500,
+        max_backoff: float = 60,
+    ):
+        self.path = path
+        self.client = client or ApiClient()
+        self.max_batch = max_batch
+        self.max_backoff = max_backoff
+        self.pending = threading.Event()
+        self.stopping = threading.Event()
+        self.thread: threading.Thread | None = None
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self.connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spool (id INTEGER PRIMARY KEY, payload TEXT NOT NULL)"
+            )
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def depth(self) -> int:
+        """
+        Number of detections waiting to be delivered.
+        """
+        with closing(self.connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def post_detections(self, filename: str, detections: list[dict]):
+        if len(detections) > 0:
+            with closing(self.connect()) as conn, conn:
+                conn.executemany(
+                    "INSERT INTO spool (payload) VALUES (?)",
+                    [(json.dumps(detection),) for detection in detections],
+                )
+            self.pending.set()
+
+            logger.info(f"Spooled {len(detections)} predictions for {filename}.")
+
+    def flush(self) -> int:
+        """
+        Send one batch of spooled detections and remove them once the web app has
+        accepted them. Returns the number of detections sent.
+        """
+        with closing(self.connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, payload FROM spool ORDER BY id LIMIT ?", (self.max_batch,)
+            ).fetchall()
+            if not rows:
+                return 0
+
+            self.client.send_detections([json.loads(payload) for _, payload in rows])
+            with conn:
+                conn.execute("DELETE FROM spool WHERE id <= ?", (rows[-1][0],))
+
+        logger.info(f"Inserted {len(rows)} spooled predictions into the database.")
+        return len(rows)
+
+    def run(self):
+        backoff = 1.0
+        while not self.stopping.is_set():
+            self.pending.clear()
+            try:
+                sent = self.flush()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.warning(
+                    f"Delivering detections failed, retrying in {backoff:.0f}s "
+                    f"({self.depth()} spooled): {e}"
+                )
+                self.stopping.wait(backoff * random.uniform(0.5, 1.5))
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            backoff = 1.0
+            if sent < self.max_batch:
+                # Let detections from a few recordings pile up into one POST
+                self.pending.wait(self.max_backoff)
+                self.stopping.wait(1)
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name="detection-spool", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self, timeout: float = 10):
+        self.stopping.set()
+        self.pending.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+
+# Model scores over the label index, per (start, end) interval of a recording
+SegmentScores = dict[tuple[float, float], np.ndarray]
+
+
+class AnalysisContext:
+    """
+    Config thresholds and location species shared by every recording in one
+    analysis pass. Contexts are picklable so they can be sent to pool workers.
+    """
+
+    def __init__(
+        self, config: dict, tflite_num_threads: int = 1, prefetch: bool = False
+    ):
+        self.tflite_num_threads = tflite_num_threads
+        self.location_species: dict = {}
+        self.coordinates = None
+        self._label_masks: dict[tuple[str, ...], tuple[np.ndarray, np.ndarray]] = {}
+
+        location = config["location"]
+        lat = location.get("lat", None)
+        long = location.get("lon", None)
+
+        if lat and long:
+            self.location_species = get_location_species(lat, long, prefetch)
+            self.coordinates = f"{lat},{long}"
+        else:
+            logger.warning("No location set, skipping location prediction")
+
+        self.min_audio_confidence = config["min_audio_confidence"] / 100
+        self.min_location_confidence = config["min_location_confidence"] / 100
+
+    def analyze_recordings(self, filenames: list[str]) -> dict[str, list[dict]]:
+        """
+        Analyze recordings together and return their detections by filename.
+        Recordings that could not be decoded are logged and left out.
+        """
+        model = get_model(self.tflite_num_threads)
+        labels = tuple(model.species)
+        predictions = predict_recordings(filenames, model)
+        detections = {}
+        with STAGE_SECONDS.time(stage="filter"):
+            for filename, scores in predictions.items():
+                recording_start, duration = parse_recording_name(filename)
+                detections[filename] = self.filter_predictions(
+                    recording_start, recording_start + duration, scores, labels
+                )
+        return detections
+
+    def get_label_mask(self, labels: tuple[str, ...]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Location scores over the model's label index and the mask of labels
+        that may be reported at all: not blacklisted and likely enough at this
+        location.
+        """
+        masks = self._label_masks.get(labels)
+        if masks is None:
+            _, _, blacklisted = split_labels(labels)
+            location_confidence = np.fromiter(
+                (self.location_species.get(label, 0) for label in labels),
+                dtype=np.float64,
+                count=len(labels),
+            )
+            allowed = ~blacklisted & (
+                location_confidence >= self.min_location_confidence
+            )
+            masks = self._label_masks[labels] = (location_confidence, allowed)
+        return masks
+
+    def filter_predictions(
+        self,
+        recording_start: float,
+        recording_end: float,
+        scores: SegmentScores,
+        labels: tuple[str, ...],
+    ) -> list[dict]:
+        """
+        Turn model scores into detection payloads, keeping scores above the
+        audio threshold and dropping blacklisted species and species unlikely at
+        this location. Intervals are offsets in seconds from `recording_start`,
+        a unix timestamp, and `labels` are the model's labels.
+        """
+        if not scores:
+            return []
+
+        scientific_names, common_names, _ = split_labels(labels)
+        location_confidence, allowed = self.get_label_mask(labels)
+
+        intervals = [f"{start},{end}" for start, end in scores]
+        matrix = np.stack(list(scores.values()))
+        rows, columns = np.nonzero((matrix >= self.min_audio_confidence) & allowed)
+        logger.debug(
+            f"Kept {len(rows)} predictions from {len(intervals)} intervals "
+            f"of {len(labels)} species"
+        )
+
+        start = datetime.fromtimestamp(recording_start, tz=timezone.utc).isoformat()
+        end = datetime.fromtimestamp(recording_end, tz=timezone.utc).isoformat()
+        return [
+            {
+                "recording_start": start,
+                "recording_end": end,
+                "interval": intervals[row],
+                "scientific_name": scientific_name,
+                "common_name": common_name,
+                "audio_confidence": audio,
+                "location_confidence": loc,
+                "location": self.coordinates,
+            }
+            for row, scientific_name, common_name, audio, loc in zip(
+                rows.tolist(),
+                scientific_names[columns].tolist(),
+                common_names[columns].tolist(),
+                matrix[rows, columns].tolist(),
+                location_confidence[columns].tolist(),
+            )
+        ]
+
+
+Segment = tuple[str, tuple[float, float], np.ndarray]
+
+
+def read_wav(path: Path) -> tuple[np.ndarray, int]:
+    """
+    Read a mono WAV file as float32 samples in [-1, 1) and its sample rate.
+
+    16-bit PCM, which is what the recorder writes, is memory-mapped and
+    converted in one vectorized step. Anything else goes through soundfile.
+    """
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError(f"{path.name} is not a WAV file")
+
+        fmt = None
+        while len(chunk := f.read(WAV_CHUNK.size)) == WAV_CHUNK.size:
+            chunk_id, size = WAV_CHUNK.unpack(chunk)
+            if chunk_id == b"data":
+                break
+            data = f.read(size + size % 2)
+            if chunk_id == b"fmt ":
+                fmt = WAV_FORMAT.unpack_from(data)
+        else:
+            raise ValueError(f"{path.name} has no data chunk")
+        offset = f.tell()
+
+    if fmt is None:
+        raise ValueError(f"{path.name} has no fmt chunk")
+    audio_format, channels, sample_rate, _, _, bits = fmt
+    if channels != 1:
+        raise ValueError(f"{path.name} needs to be a mono audio file")
+
+    if audio_format not in (WAV_FORMAT_PCM, WAV_FORMAT_EXTENSIBLE) or bits != 16:
+        audio, sample_rate = sf.read(path, dtype=np.float32)
+        return audio, sample_rate
+
+    # An interrupted recorder can leave a bogus data size, trust the file size
+    count = min(size, path.stat().st_size - offset) // 2
+    if count <= 0:
+        return np.zeros(0, dtype=np.float32), sample_rate
+    pcm = np.memmap(path, dtype="<i2", mode="r", offset=offset, shape=(count,))
+    return pcm.astype(np.float32) / 32768.0, sample_rate
+
+
+@functools.cache
+def resample_filter(up: int, down: int) -> np.ndarray:
+    """
+    Low-pass filter for polyphase resampling by `up`/`down`, designed once per
+    rate pair instead of on every call. Same design as `resample_poly`'s default.
+    """
+    max_rate = max(up, down)
+    taps = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+    # Matching the signal's float32 keeps upfirdn off the float64 path
+    return taps.astype(np.float32)
+
+
+def resample(audio: np.ndarray, sample_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Resample a whole signal in one vectorized pass. A no-op when the recorder
+    already records at the model's rate.
+    """
+    if sample_rate == target_rate:
+        return audio
+
+    gcd = math.gcd(sample_rate, target_rate)
+    up, down = target_rate // gcd, sample_rate // gcd
+    resampled = resample_poly(audio, up, down, window=resample_filter(up, down))
+    return resampled.astype(np.float32)
+
+
+def split_recording(
+    key: str, audio: np.ndarray, sample_rate: int, model: AudioModelV2M4TFLite
+) -> list[Segment]:
+    """
+    Resample a recording to the model's rate once and split it into the model's
+    3 second segments, padding the last one with silence.
+    """
+    audio = resample(audio, sample_rate, model.sample_rate)
+    chunk_sample_size = round(model.sample_rate * model.chunk_size_s)
+
+    segments = []
+    for offset in range(0, len(audio), chunk_sample_size):
+        chunk = audio[offset : offset + chunk_sample_size]
+        start = offset / model.sample_rate
+        end = start + len(chunk) / model.sample_rate
+        segments.append(
+            (key, (start, end), fillup_with_silence(chunk, chunk_sample_size))
+        )
+    return segments
+
+
+def predict_segments(
+    segments: list[Segment],
+    model: AudioModelV2M4TFLite,
+    batch_size: int = 100,
+) -> dict[str, SegmentScores]:
+    """
+    Run segments from any number of recordings through the model in batches and
+    scatter the score rows back per recording.
+
+    Mirrors `birdnet.predict_species_within_audio_file` with its default
+    bandpass and sigmoid settings, but pays the interpreter overhead once per
+    batch instead of once per file. Scores stay arrays over the model's label
+    index, thresholds are applied by `AnalysisContext.filter_predictions`.
+    """
+    predictions: dict[str, SegmentScores] = {}
+    for key, _, _ in segments:
+        predictions.setdefault(key, {})
+
+    for offset in range(0, len(segments), batch_size):
+        batch_segments = segments[offset : offset + batch_size]
+        batch = np.array([chunk for _, _, chunk in batch_segments], np.float32)
+        scores = flat_sigmoid(model.predict_species(batch), sensitivity=-1.0)
+
+        for (key, interval, _), row in zip(batch_segments, scores):
+            predictions[key][interval] = row
+
+    return predictions
+
+
+class SlidingWindow:
+    """
+    Splits a continuous stream into model-sized windows that overlap by
+    `overlap` seconds, including windows that straddle two buffers.
+
+    Samples that don't fill a whole step yet are kept as the tail and prefixed
+    to the next buffer, so every window is scored exactly once no matter how
+    the stream was chunked. Windows are keyed by their absolute start time.
+    """
+
+    def __init__(self, model: AudioModelV2M4TFLite, overlap: float = 0.0):
+        if not 0 <= overlap < model.chunk_size_s:
+            raise ValueError(
+                f"Overlap must be in [0, {model.chunk_size_s}) seconds, got {overlap}"
+            )
+        self.sample_rate = model.sample_rate
+        self.chunk_duration = model.chunk_size_s
+        self.size = round(model.sample_rate * model.chunk_size_s)
+        self.step = round(model.sample_rate * (model.chunk_size_s - overlap))
+        self.tail = np.zeros(0, dtype=np.float32)
+        self.time: float | None = None
+
+    def reset(self, time: float):
+        """
+        Drop the tail and restart the stream at unix timestamp `time`, e.g. after
+        a gap in the audio.
+        """
+        self.tail = np.zeros(0, dtype=np.float32)
+        self.time = time
+
+    def push(self, audio: np.ndarray, sample_rate: int, time: float) -> list[Segment]:
+        """
+        Add a buffer of audio starting at unix timestamp `time` and return the
+        windows that are now complete.
+        """
+        if self.time is None:
+            self.reset(time)
+        assert self.time is not None
+
+        audio = resample(audio, sample_rate, self.sample_rate)
+        data = np.concatenate((self.tail, audio))
+
+        segments = []
+        offset = 0
+        while offset + self.size <= len(data):
+            start = self.time + offset / self.sample_rate
+            segments.append(
+                (
+                    f"{start:.3f}",
+                    (start, start + self.chunk_duration),
+                    data[offset : offset + self.size],
+                )
+            )
+            offset += self.step
+
+        self.tail = data[offset:]
+        self.time += offset / self.sample_rate
+        return segments
+
+    def flush(self) -> list[Segment]:
+        """
+        Return the leftover tail as a final window padded with silence.
+        """
+        if self.time is None or len(self.tail) == 0:
+            return []
+
+        start = self.time
+        end = start + len(self.tail) / self.sample_rate
+        segment = (
+            f"{start:.3f}",
+            (start, end),
+            fillup_with_silence(self.tail, self.size),
+        )
+        self.reset(end)
+        return [segment]
+
+
+def quarantine_recording(filename: str):
+    """
+    Move a recording that cannot be decoded to `recordings/failed`, so rescans
+    of the recordings directory don't retry it forever.
+    """
+    failed_dir = recordings_dir / "failed"
+    failed_dir.mkdir(exist_ok=True)
+    try:
+        os.replace(recordings_dir / filename, failed_dir / filename)
+    except OSError as e:
+        logger.error(f"Could not move {filename} to {failed_dir}: {e}")
+    else:
+        logger.warning(f"Moved {filename} to {failed_dir}")
+
+
+def predict_recordings(
+    filenames: list[str],
+    model: AudioModelV2M4TFLite,
+) -> dict[str, SegmentScores]:
+    """
+    Decode recordings into the model's 3 second segments and run them through
+    the model as a single batch.
+    """
+    decoded: list[str] = []
+    segments: list[Segment] = []
+
+    for filename in filenames:
+        logger.info(f"Analyzing recording {filename}")
+        with STAGE_SECONDS.time(stage="decode"):
+            try:
+                audio, sample_rate = read_wav(recordings_dir / filename)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error(f"Could not decode recording {filename}: {e}")
+                quarantine_recording(filename)
+                continue
+            decoded.append(filename)
+            segments.extend(split_recording(filename, audio, sample_rate, model))
+
+    with STAGE_SECONDS.time(stage="inference"):
+        predictions = predict_segments(segments, model)
+    # A recording without samples has no segments, but is done all the same
+    return {filename: predictions.get(filename, {}) for filename in decoded}
+
+
+def init_worker(tflite_num_threads: int):
+    """
+    Load a model into each pool worker up front so the first recording it is
+    handed doesn't pay for it.
+    """
+    # Shutdown is driven by the parent process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    get_model(tflite_num_threads)
+
+
+def analyze_in_worker(
+    context: AnalysisContext, filenames: list[str]
+) -> tuple[dict[str, list[dict]], dict]:
+    """
+    Pool entry point. Also hands back the stage timings recorded since the
+    last batch, which only the parent process reports.
+    """
+    return context.analyze_recordings(filenames), metrics.REGISTRY.snapshot(reset=True)
+
+
+def create_pool(
+    workers: int, tflite_num_threads: int
+) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Start a pool of analyzer processes, each holding its own BirdNET model.
+    """
+    logger.info(
+        f"Starting {workers} analyzer workers ({tflite_num_threads} TFLite threads each)"
+    )
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        # Forking after TensorFlow has started its threads is unsafe
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(tflite_num_threads,),
+    )
+
+
+class DetectionSink(Protocol):
+    def post_detections(self, filename: str, detections: list[dict]): ...
+
+
+def process_recordings(
+    context: AnalysisContext,
+    client: DetectionSink,
+    filenames: list[str],
+    batch_size: int = 8,
+    pool: concurrent.futures.Executor | None = None,
+    workers: int = 1,
+    stopping: threading.Event | None = None,
+    on_done=None,
+):
+    """
+    Analyze recordings in batches of up to `batch_size`, store their detections
+    in recording order and remove them from disk. With a pool, batches are
+    analyzed in parallel by `workers` processes.
+    """
+    if pool is not None:
+        # Spread the recordings over every worker rather than filling the first
+        batch_size = max(1, min(batch_size, -(-len(filenames) // workers)))
+    batches = [
+        filenames[offset : offset + batch_size]
+        for offset in range(0, len(filenames), batch_size)
+    ]
+
+    futures: list = [None] * len(batches)
+    if pool is not None:
+        futures = [pool.submit(analyze_in_worker, context, b) for b in batches]
+
+    for batch, future in zip(batches, futures):
+        if stopping is not None and stopping.is_set():
+            return
+
+        try:
+            if future is None:
+                results = context.analyze_recordings(batch)
+            else:
+                results, worker_metrics = future.result()
+                metrics.REGISTRY.merge(worker_metrics)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.exception(e)
+            results = {}
+
+        for filename in batch:
+            try:
+                if filename in results:
+                    client.post_detections(filename, results[filename])
+                    os.remove(recordings_dir / filename)
+                    RECORDINGS_ANALYZED.inc()
+                    logger.debug(f"Removed recording {filename} after analysis.")
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.exception(e)
+            finally:
+                if on_done is not None:
+                    on_done(filename)
+
+
+def analyze(
+    workers: int = 1,
+    tflite_num_threads: int = 1,
+    batch_size: int = 8,
+    direct_db: bool = False,
+):
+    """
+    Analyze audio recordings in the recordings directory and store predictions in the database.
+    """
+    client = DatabaseClient() if direct_db else ApiClient()
+    context = AnalysisContext(client.get_config(), tflite_num_threads)
+
+    wav_files = list_recordings()
+    logger.debug(f"Found {len(wav_files)} recordings to analyze.")
+
+    if workers > 1 and len(wav_files) > 1:
+        workers = min(workers, len(wav_files))
+        with create_pool(workers, tflite_num_threads) as pool:
+            process_recordings(
+                context, client, wav_files, batch_size, pool=pool, workers=workers
+            )
+    else:
+        process_recordings(context, client, wav_files, batch_size)
+
+
+def send_heartbeat(service: str = "analyzer", **stats):
+    try:
+        requests.get(
+            f"{API_URL}/heartbeat/{service}", params=stats, timeout=5
+        ).raise_for_status()
+    except requests.RequestException as e:
+        logger.warning(f"Heartbeat failed: {e}")
+
+
+class RecordingQueue:
+    """
+    Bounded work queue of recording names ordered by recording timestamp.
+
+    A name stays known to the queue from `put` until `task_done`, so rescans of the
+    recordings directory never enqueue a recording that is already being analyzed.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self.overflowed = False
+        self._heap: list[tuple[tuple[int, int], str]] = []
+        self._names: set[str] = set()
+        self._lock = threading.Condition()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._heap)
+
+    def put(self, filename: str) -> bool:
+        """
+        Enqueue a recording. Returns False when the queue is full; the recording
+        stays on disk and is picked up by the next rescan.
+        """
+        try:
+            key = parse_recording_name(filename)
+        except ValueError:
+            logger.warning(f"SKIP: unexpected recording name {filename}")
+            return True
+
+        with self._lock:
+            if filename in self._names:
+                return True
+            if len(self._heap) >= self.maxsize:
+                self.overflowed = True
+                return False
+            heapq.heappush(self._heap, (key, filename))
+            self._names.add(filename)
+            self._lock.notify()
+        return True
+
+    def get_batch(self, max_items: int, timeout: float) -> list[str]:
+        """
+        Wait up to `timeout` seconds for recordings and return up to `max_items`
+        of the oldest ones.
+        """
+        with self._lock:
+            self._lock.wait_for(lambda: self._heap, timeout)
+            batch: list[str] = []
+            while self._heap and len(batch) < max_items:
+                batch.append(heapq.heappop(self._heap)[1])
+            return batch
+
+    def requeue(self, filenames: list[str]):
+        """
+        Put recordings that were taken but not analyzed back into the queue.
+        """
+        with self._lock:
+            for filename in filenames:
+                heapq.heappush(self._heap, (parse_recording_name(filename), filename))
+            self._lock.notify()
+
+    def task_done(self, filename: str):
+        with self._lock:
+            self._names.discard(filename)
+
+
+def inotify_watch(directory: Path) -> int | None:
+    """
+    Open an inotify descriptor reporting recordings that finished writing or were
+    moved into `directory`. Returns None where inotify is unavailable.
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+
+    wd = libc.inotify_add_watch(
+        fd, str(directory).encode(), IN_CLOSE_WRITE | IN_MOVED_TO
+    )
+    if wd < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def read_inotify_events(fd: int) -> Iterator[tuple[int, str]]:
+    """
+    Yield (mask, filename) for every pending event on an inotify descriptor.
+    """
+    try:
+        data = os.read(fd, 64 * 1024)
+    except BlockingIOError:
+        return
+
+    offset = 0
+    while offset < len(data):
+        _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+        offset += INOTIFY_EVENT.size
+        name = data[offset : offset + length].rstrip(b"\0").decode()
+        offset += length
+        yield mask, name
+
+
+class RecordingWatcher(threading.Thread):
+    """
+    Feeds new recordings into a `RecordingQueue` using inotify events, falling
+    back to polling the recordings directory when inotify is unavailable.
+    """
+
+    def __init__(
+        self,
+        queue: RecordingQueue,
+        stopping: threading.Event,
+        poll_interval: float = 2,
+        rescan_interval: float = 60,
+    ):
+        super().__init__(name="recording-watcher", daemon=True)
+        self.queue = queue
+        self.stopping = stopping
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+
+    def scan(self):
+        self.queue.overflowed = False
+        for filename in list_recordings():
+            if not self.queue.put(filename):
+                break
+
+    def run(self):
+        fd = inotify_watch(recordings_dir)
+        # Scan after the watch is in place so nothing written in between is missed
+        self.scan()
+
+        if fd is None:
+            logger.warning(
+                f"inotify unavailable, polling {recordings_dir} every {self.poll_interval}s"
+            )
+            while not self.stopping.wait(self.poll_interval):
+                self.scan()
+            return
+
+        logger.debug(f"Watching {recordings_dir} for new recordings")
+        try:
+            self.watch(fd)
+        finally:
+            os.close(fd)
+
+    def watch(self, fd: int):
+        last_scan = datetime.now().timestamp()
+        while not self.stopping.is_set():
+            ready, _, _ = select.select([fd], [], [], 1)
+            if ready:
+                for mask, filename in read_inotify_events(fd):
+                    if mask & IN_Q_OVERFLOW:
+                        self.queue.overflowed = True
+                    elif fnmatch.fnmatch(filename, "*.wav"):
+                        self.queue.put(filename)
+
+            # Pick up recordings dropped while the queue was full, and anything an
+            # event was missed for.
+            now = datetime.now().timestamp()
+            overflow_cleared = self.queue.overflowed and (
+                len(self.queue) < self.queue.maxsize
+            )
+            if overflow_cleared or now - last_scan > self.rescan_interval:
+                self.scan()
+                last_scan = now
+
+
+class AnalyzerDaemon:
+    """
+    Long-lived analyzer that keeps the BirdNET model loaded and processes new
+    recordings as they arrive.
+    """
+
+    def __init__(
+        self,
+        interval: float = 2,
+        heartbeat_interval: float = 10,
+        queue_size: int = 64,
+        workers: int = 1,
+        tflite_num_threads: int = 1,
+        batch_size: int = 8,
+        direct_db: bool = False,
+    ):
+        self.interval = interval
+        self.heartbeat_interval = heartbeat_interval
+        self.workers = workers
+        self.tflite_num_threads = tflite_num_threads
+        self.batch_size = batch_size
+        self.stopping = threading.Event()
+        self.queue = RecordingQueue(maxsize=max(queue_size, batch_size * workers))
+        self.client = DatabaseClient() if direct_db else ApiClient()
+        self.spool = DetectionSpool(cache_dir / "analyzer-spool.sqlite3", self.client)
+        self.pool: concurrent.futures.ProcessPoolExecutor | None = None
+
+    def stop(self, *args):
+        if not self.stopping.is_set():
+            logger.info("Stopping analyzer daemon...")
+        self.stopping.set()
+
+    def heartbeat(self):
+        while not self.stopping.is_set():
+            RECORDINGS_BACKLOG.set(
+                sum(1 for name in os.listdir(recordings_dir) if name.endswith(".wav"))
+            )
+            RECORDINGS_QUEUED.set(len(self.queue))
+            send_heartbeat(
+                spool_depth=self.spool.depth(),
+                metrics=json.dumps(metrics.REGISTRY.snapshot()),
+            )
+            self.stopping.wait(self.heartbeat_interval)
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        if self.workers > 1:
+            self.pool = create_pool(self.workers, self.tflite_num_threads)
+        else:
+            get_model(self.tflite_num_threads)
+
+        self.spool.start()
+        threading.Thread(target=self.heartbeat, daemon=True).start()
+        RecordingWatcher(self.queue, self.stopping, poll_interval=self.interval).start()
+        logger.info("Analyzer daemon started")
+
+        try:
+            while not self.stopping.is_set():
+                batch = self.queue.get_batch(self.batch_size * self.workers, timeout=1)
+                if batch:
+                    self.process_batch(batch)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+            self.spool.stop()
+
+        logger.info("Analyzer daemon stopped")
+
+    def process_batch(self, batch: list[str]):
+        try:
+            context = AnalysisContext(
+                self.client.get_config(), self.tflite_num_threads, prefetch=True
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.exception(e)
+            self.queue.requeue(batch)
+            self.stopping.wait(self.interval)
+            return
+
+        process_recordings(
+            context,
+            self.spool,
+            batch,
+            self.batch_size,
+            pool=self.pool,
+            workers=self.workers,
+            stopping=self.stopping,
+            on_done=self.queue.task_done,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and analyze recordings as they arrive",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=2,
+        help="Seconds between checks for new recordings when inotify is unavailable",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=64,
+        help="Maximum number of recordings held in the daemon's work queue",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of analyzer processes, each with its own model (0 = one per core)",
+    )
+    parser.add_argument(
+        "--tflite-threads",
+        type=int,
+        default=1,
+        help="TFLite interpreter threads per analyzer process",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="Maximum number of recordings decoded into one inference batch",
+    )
+    parser.add_argument(
+        "--direct-db",
+        action="store_true",
+        help="Write detections straight into the web app's database instead of its API",
+    )
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+
+    if args.daemon:
+        AnalyzerDaemon(
+            interval=args.interval,
+            queue_size=args.queue_size,
+            workers=workers,
+            tflite_num_threads=args.tflite_threads,
+            batch_size=args.batch_size,
+            direct_db=args.direct_db,
+        ).run()
+    else:
+        analyze(
+            workers=workers,
+            tflite_num_threads=args.tflite_threads,
+            batch_size=args.batch_size,
+            direct_db=args.direct_db,
+        )
 
 
 if __name__ == "__main__":
-    analyze()
+    main()
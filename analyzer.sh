@@ -2,26 +2,26 @@
 # shellcheck shell=bash
 
 # Configuration
-RECORDINGS_DIR="recordings"
+# Only used when inotify is unavailable and the daemon falls back to polling
 SLEEP_SECONDS=2
+# Analyzer processes (0 = one per core) and TFLite threads per process
+WORKERS="${ANALYZER_WORKERS:-1}"
+TFLITE_THREADS="${ANALYZER_TFLITE_THREADS:-1}"
+# Set to 1 to write detections straight into db.sqlite3 instead of the web API
+DIRECT_DB="${ANALYZER_DIRECT_DB:-0}"
 
-# Handle interrupt signal
-trap 'echo "Stopping WAV file monitor..."; exit 0' INT TERM
+EXTRA_ARGS=()
+if [ "$DIRECT_DB" = "1" ]; then
+    EXTRA_ARGS+=(--direct-db)
+fi
 
-echo "Starting WAV file monitor (checking every $SLEEP_SECONDS seconds)..."
+echo "Starting analyzer daemon..."
 echo "Press Ctrl+C to stop"
 
-while true; do
-    curl --fail http://localhost:5000/heartbeat/analzyer
-
-    # Find WAV files
-    wav_files=$(find "$RECORDINGS_DIR" -type f -name "*.wav")
-
-    # Check if any WAV files were found
-    if [ -n "$wav_files" ]; then
-        echo "$(date '+%Y-%m-%d %H:%M:%S') - Found WAV files"
-        poetry run python -m analyzer
-    fi
-
-    sleep "$SLEEP_SECONDS"
-done
+# The daemon loads the BirdNET model once, sends its own heartbeat and
+# handles INT/TERM by finishing the current recording before exiting.
+exec poetry run python -m analyzer --daemon \
+    --interval "$SLEEP_SECONDS" \
+    --workers "$WORKERS" \
+    --tflite-threads "$TFLITE_THREADS" \
+    "${EXTRA_ARGS[@]}"
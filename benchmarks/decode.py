@@ -0,0 +1,79 @@
+"""Benchmark decoding and resampling a recording into model-sized segments.
+
+Compares BirdNET's own chunked loader against the analyzer's memory-mapped,
+resample-once path, for recordings made at 44.1 kHz and at the model's native
+48 kHz.
+
+    poetry run python -m benchmarks.decode
+"""
+
+import argparse
+import tempfile
+import time
+import wave
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+from birdnet.utils import load_audio_in_chunks_with_overlap  # type: ignore
+
+from analyzer import read_wav, split_recording
+
+
+MODEL = SimpleNamespace(sample_rate=48000, chunk_size_s=3.0)
+
+
+def write_recording(path: Path, sample_rate: int, duration: int):
+    rng = np.random.default_rng(0)
+    noise = rng.normal(0, 0.1, sample_rate * duration)
+    pcm = (np.clip(noise, -1, 1) * 32767).astype("<i2")
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+
+
+def decode_birdnet(path: Path):
+    return list(
+        load_audio_in_chunks_with_overlap(
+            path,
+            chunk_duration_s=MODEL.chunk_size_s,
+            target_sample_rate=MODEL.sample_rate,
+        )
+    )
+
+
+def decode_analyzer(path: Path):
+    audio, sample_rate = read_wav(path)
+    return split_recording(path.name, audio, sample_rate, MODEL)  # type: ignore
+
+
+def timeit(func, path: Path, iterations: int) -> float:
+    func(path)  # warm up caches, e.g. the resample filter
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(path)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--duration", type=int, default=12)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for sample_rate in (44100, 48000):
+            path = Path(tmp) / f"{sample_rate}.wav"
+            write_recording(path, sample_rate, args.duration)
+            for name, func in (
+                ("birdnet", decode_birdnet),
+                ("analyzer", decode_analyzer),
+            ):
+                ms = timeit(func, path, args.iterations)
+                print(f"{sample_rate} Hz  {name:<9} {ms:8.2f} ms/clip")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark storing detections through the web API against direct database writes.
+
+Both paths insert batches of the same shape into a throwaway copy of the
+schema. The API path goes through a real HTTP round-trip to the Django app's
+NDJSON bulk endpoint, including CSRF, validation and duplicate checks, while
+the direct path bulk-inserts through the ORM in one transaction per batch.
+
+    poetry run python -m benchmarks.ingest
+"""
+
+import argparse
+import itertools
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "scout.settings")
+
+# pylint: disable=wrong-import-position
+import analyzer
+from analyzer import ApiClient, DatabaseClient
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+recordings = itertools.count()
+
+
+def make_detections(count: int) -> list[dict]:
+    # Every batch is a new recording, the ingest paths skip detections they
+    # already stored
+    start = datetime.now(timezone.utc) + timedelta(seconds=next(recordings) * 12)
+    end = start + timedelta(seconds=12)
+    return [
+        {
+            "recording_start": start.isoformat(),
+            "recording_end": end.isoformat(),
+            "interval": f"{i % 4 * 3.0},{i % 4 * 3.0 + 3.0}",
+            "scientific_name": f"Genus species{i // 4}",
+            "common_name": f"Bird {i // 4}",
+            "audio_confidence": 0.9,
+            "location_confidence": 0.5,
+            "location": None,
+        }
+        for i in range(count)
+    ]
+
+
+def serve(app) -> str:
+    server = make_server("127.0.0.1", 0, app, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def timeit(client, batches: list[list[dict]]) -> float:
+    start = time.perf_counter()
+    for batch in batches:
+        client.send_detections(batch)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # pylint: disable=import-outside-toplevel
+        from django.conf import settings
+
+        settings.DATABASES["default"]["NAME"] = Path(tmp) / "db.sqlite3"
+        direct = DatabaseClient()
+
+        from django.core.management import call_command
+        from django.core.wsgi import get_wsgi_application
+
+        call_command("migrate", verbosity=0)
+        analyzer.API_URL = serve(get_wsgi_application())
+        api = ApiClient()
+        api.get_config()  # picks up the CSRF cookie
+
+        total = args.batches * args.batch_size
+        for name, client in (("api", api), ("direct-db", direct)):
+            client.send_detections(make_detections(1))  # warm up connections
+            batches = [make_detections(args.batch_size) for _ in range(args.batches)]
+            seconds = timeit(client, batches)
+            print(
+                f"{name:<10} {total / seconds:10.0f} detections/s"
+                f"  {seconds / args.batches * 1000:8.2f} ms/batch"
+            )
+
+
+if __name__ == "__main__":
+    main()
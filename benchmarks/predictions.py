@@ -0,0 +1,106 @@
+"""Benchmark turning model scores into detection payloads.
+
+Compares the per-label loop the analyzer used to run (threshold, split the
+label, scan the blacklist and look up the location score for every prediction)
+against `AnalysisContext.filter_predictions`, which works on masks over the
+model's label index. Low audio thresholds keep most predictions, which is where
+the loop showed up in profiles.
+
+    poetry run python -m benchmarks.predictions
+"""
+
+import argparse
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from loguru import logger
+
+from analyzer import AnalysisContext, is_invalid_prediction
+
+
+def make_labels(count: int) -> tuple[str, ...]:
+    labels = [f"Genus species{i}_Bird {i}" for i in range(count)]
+    labels[::50] = [f"Dog {i}_Dog" for i in range(len(labels[::50]))]
+    return tuple(labels)
+
+
+def make_context(labels: tuple[str, ...], min_audio_confidence: int):
+    rng = np.random.default_rng(0)
+    context = AnalysisContext(
+        {
+            "location": {},
+            "min_audio_confidence": min_audio_confidence,
+            "min_location_confidence": 1,
+        }
+    )
+    context.location_species = {
+        label: float(score) for label, score in zip(labels, rng.random(len(labels)))
+    }
+    return context
+
+
+def filter_loop(context, recording_start, recording_end, scores, labels):
+    detections = []
+    for interval, row in scores.items():
+        for i in np.flatnonzero(row >= context.min_audio_confidence):
+            prediction = labels[i]
+            scientific_name, common_name = prediction.split("_")
+            if is_invalid_prediction(scientific_name):
+                continue
+            loc_confidence = context.location_species.get(prediction, 0)
+            if loc_confidence < context.min_location_confidence:
+                continue
+            detections.append(
+                {
+                    "recording_start": datetime.fromtimestamp(
+                        recording_start, tz=timezone.utc
+                    ).isoformat(),
+                    "recording_end": datetime.fromtimestamp(
+                        recording_end, tz=timezone.utc
+                    ).isoformat(),
+                    "interval": f"{interval[0]},{interval[1]}",
+                    "scientific_name": scientific_name,
+                    "common_name": common_name,
+                    "audio_confidence": float(row[i]),
+                    "location_confidence": float(loc_confidence),
+                    "location": context.coordinates,
+                }
+            )
+    return detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--labels", type=int, default=6522)
+    parser.add_argument("--intervals", type=int, default=20)
+    parser.add_argument("--min-audio-confidence", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    logger.remove()
+
+    labels = make_labels(args.labels)
+    rng = np.random.default_rng(1)
+    scores = {
+        (i * 3.0, i * 3.0 + 3.0): rng.beta(0.5, 4, args.labels).astype(np.float32)
+        for i in range(args.intervals)
+    }
+
+    for name, run in (
+        ("loop", filter_loop),
+        ("masks", AnalysisContext.filter_predictions),
+    ):
+        # A fresh context per run, so label masks are built inside the timing
+        context = make_context(labels, args.min_audio_confidence)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            detections = run(context, 1.7e9, 1.7e9 + 60, scores, labels)
+        seconds = (time.perf_counter() - start) / args.repeat
+        print(
+            f"{name:<6} {seconds * 1000:8.2f} ms/recording  "
+            f"{len(detections)} detections"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark rendering the detections pages over a large history.
+
+Seeds a throwaway database with a daily rollup for many species over many days
+and times the listing query on its own and the full pages served through the
+Django test client: the home page, the polled recent detections and one page of
+older detections.
+
+    poetry run python -m benchmarks.render
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "scout.settings")
+
+# pylint: disable=wrong-import-position
+import django
+from django.conf import settings
+
+
+def seed(days: int, species: int):
+    from web import models  # pylint: disable=import-outside-toplevel
+
+    rng = random.Random(0)
+    ids = list(
+        models.Species.species.get_ids(
+            {f"Genus species{i}": f"Bird {i}" for i in range(species)}
+        ).values()
+    )
+    now = datetime.now().astimezone()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    summaries = []
+    for day in range(days):
+        start = midnight - timedelta(days=day)
+        for species_id in ids:
+            sample_count = rng.randrange(1, 200)
+            seconds = rng.uniform(0, min(86400, (now - start).total_seconds()))
+            summaries.append(
+                models.DailySpeciesSummary(
+                    date=start.date(),
+                    species_id=species_id,
+                    sample_count=sample_count,
+                    audio_confidence_sum=sample_count * rng.uniform(0.7, 1),
+                    location_confidence=rng.random(),
+                    last_detected_at=start + timedelta(seconds=seconds),
+                )
+            )
+    models.DailySpeciesSummary.summaries.bulk_create(summaries, batch_size=5000)
+
+
+def timeit(run, repeat: int) -> tuple[float, float]:
+    run()  # warm up caches and connections
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return statistics.median(timings) * 1000, timings[int(len(timings) * 0.95)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--species", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.DATABASES["default"]["NAME"] = Path(tmp) / "db.sqlite3"
+        settings.CONFIG_VERSION_FILE = Path(tmp) / "config.version"
+        django.setup()
+        # pylint: disable=import-outside-toplevel
+        from django.core.management import call_command
+        from django.test import Client
+        from web import models
+
+        call_command("migrate", verbosity=0)
+        seed(args.days, args.species)
+        config = models.Config.config.get_config()
+        # Keep the location lookup out of the timings
+        config.location = {"source": "manual", "lat": 0, "lon": 0}
+        config.save()
+
+        client = Client()
+        since = date.today() - timedelta(days=6)
+        older = f"/views/detections/older?until={since - timedelta(days=1)}"
+        cases = {
+            "get_valid (7 days)": lambda: models.Detection.detections.get_valid(
+                config, since=since
+            ),
+            "home page": lambda: client.get("/"),
+            "recent detections": lambda: client.get("/views/detections"),
+            "older page": lambda: client.get(older),
+        }
+        print(f"{args.days} days x {args.species} species")
+        for name, run in cases.items():
+            p50, p95 = timeit(run, args.repeat)
+            print(f"{name:<20} p50 {p50:8.2f} ms  p95 {p95:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
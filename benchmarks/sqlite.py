@@ -0,0 +1,232 @@
+"""Benchmark page loads while detections are written from another process.
+
+Runs the same workload against Django's default SQLite setup and against the
+tuned profile in scout.settings (WAL, pragmas, busy timeout, IMMEDIATE
+transactions and persistent connections). A writer process bulk-inserts
+detections like the analyzer does, while reader processes run the detections
+panel's queries like web workers serving open dashboards.
+
+    poetry run python -m benchmarks.sqlite
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from scout.settings import SQLITE_OPTIONS
+
+
+PROFILES = {
+    "default": {"OPTIONS": {}, "CONN_MAX_AGE": 0},
+    "tuned": {"OPTIONS": SQLITE_OPTIONS, "CONN_MAX_AGE": 600},
+}
+
+
+def setup_django(path: Path, profile: str):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "scout.settings")
+    # pylint: disable=import-outside-toplevel
+    import django
+    from django.conf import settings
+
+    settings.DATABASES["default"].update(NAME=path, **PROFILES[profile])
+    django.setup()
+
+
+def make_detections(count: int, offset: int = 0):
+    from web import models  # pylint: disable=import-outside-toplevel
+
+    now = datetime.now(timezone.utc)
+    payloads = []
+    for i in range(offset, offset + count):
+        start = now - timedelta(minutes=i % (60 * 24 * 30))
+        payloads.append(
+            {
+                "recording_start": start,
+                "recording_end": start + timedelta(seconds=12),
+                "interval": "0.0,3.0",
+                "scientific_name": f"Genus species{i % 150}",
+                "common_name": f"Bird {i % 150}",
+                "audio_confidence": 0.8,
+                "location_confidence": 0.5,
+                "location": None,
+            }
+        )
+    return models.Detection.detections.from_payloads(payloads)
+
+
+def write(path, profile, seconds, batch_size, interval, start, results):
+    setup_django(path, profile)
+    # pylint: disable=import-outside-toplevel
+    from django.db import OperationalError
+    from web import models
+
+    latencies = []
+    errors = 0
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        detections = make_detections(batch_size)
+        started = time.perf_counter()
+        try:
+            models.Detection.detections.create_batch(detections)
+        except OperationalError:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+        # The analyzer posts a batch per recording, not back to back
+        time.sleep(interval)
+    results.put((latencies, errors))
+
+
+def percentiles(latencies: list[float]) -> tuple[float, float]:
+    """
+    Median and 95th percentile in milliseconds.
+    """
+    if not latencies:
+        return 0, 0
+    latencies = sorted(latencies)
+    return (
+        statistics.median(latencies) * 1000,
+        latencies[int(len(latencies) * 0.95)] * 1000,
+    )
+
+
+def read(path, profile, seconds, start, results):
+    setup_django(path, profile)
+    # pylint: disable=import-outside-toplevel
+    from django.db import OperationalError, close_old_connections
+    from web import models
+
+    since = datetime.now().date() - timedelta(days=6)
+    latencies = []
+    errors = 0
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        # Connections are handled like a request would: closed afterwards
+        # unless CONN_MAX_AGE keeps them open
+        started = time.perf_counter()
+        close_old_connections()
+        try:
+            config = models.Config.config.fetch_config()
+            list(models.Detection.detections.get_valid(config, since=since))
+            models.Detection.detections.get_discovered(config).count()
+        except OperationalError:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+        close_old_connections()
+    results.put((latencies, errors))
+
+
+def run(profile: str, args: argparse.Namespace, results):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "db.sqlite3"
+        setup_django(path, profile)
+        # pylint: disable=import-outside-toplevel
+        from django.core.management import call_command
+        from django.db import connection
+        from web import models
+
+        call_command("migrate", verbosity=0)
+        if profile == "default":
+            # The migrations switch the database to WAL, undo it for the
+            # baseline
+            connection.cursor().execute("PRAGMA journal_mode=DELETE")
+        models.Detection.detections.bulk_create(
+            make_detections(args.seed), batch_size=5000
+        )
+        models.DailySpeciesSummary.summaries.rebuild()
+        connection.close()
+
+        context = multiprocessing.get_context("spawn")
+        writes = context.Queue()
+        reads = context.Queue()
+        # Start measuring once every process has imported Django
+        start = context.Barrier(args.readers + 1)
+        processes = [
+            context.Process(
+                target=write,
+                args=(
+                    path,
+                    profile,
+                    args.seconds,
+                    args.batch_size,
+                    args.write_interval,
+                    start,
+                    writes,
+                ),
+            )
+        ]
+        processes += [
+            context.Process(
+                target=read, args=(path, profile, args.seconds, start, reads)
+            )
+            for _ in range(args.readers)
+        ]
+        for process in processes:
+            process.start()
+
+        read_latencies: list[float] = []
+        read_errors = 0
+        for _ in range(args.readers):
+            latencies, errors = reads.get()
+            read_latencies += latencies
+            read_errors += errors
+        write_latencies, write_errors = writes.get()
+        for process in processes:
+            process.join()
+
+        results.put(
+            {
+                "profile": profile,
+                "reads": len(read_latencies) / args.seconds,
+                "read": percentiles(read_latencies),
+                "read_errors": read_errors,
+                "writes": len(write_latencies) * args.batch_size / args.seconds,
+                "write": percentiles(write_latencies),
+                "write_errors": write_errors,
+            }
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=100_000)
+    parser.add_argument(
+        "--write-interval",
+        type=float,
+        default=0.5,
+        help="seconds the writer sleeps between batches, 0 writes flat out",
+    )
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    for profile in PROFILES:
+        # Each profile needs its own Django setup, so run it in a fresh process
+        results = context.Queue()
+        process = context.Process(target=run, args=(profile, args, results))
+        process.start()
+        result = results.get()
+        process.join()
+        print(
+            f"{result['profile']:<8} "
+            f"reads {result['reads']:6.1f}/s  "
+            "p50 {:7.1f} ms  p95 {:7.1f} ms  ".format(*result["read"])
+            + f"errors {result['read_errors']:3d}  |  "
+            f"writes {result['writes']:6.0f} detections/s  "
+            "p50 {:7.1f} ms  p95 {:7.1f} ms  ".format(*result["write"])
+            + f"errors {result['write_errors']:3d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""End-to-end benchmark suite, with results that can be compared between runs.
+
+Each stage runs in a fresh process against a throwaway database and
+recordings directory, with the web app served over HTTP like in production:
+
+- analyzer: synthetic `<timestamp>_<duration>.wav` recordings are written and
+  `analyzer.analyze()` stores their detections through the API (clips/s)
+- ingest: batches of detections are posted to `api/detections` and
+  `api/detections/bulk` (rows/s)
+- views: latency percentiles of the home page, the detections panel and the
+  healthcheck
+
+The ingest and views stages are repeated for every `--rows` size of a
+seeded detections table, e.g. `--rows 10000 1000000 10000000`. Results are
+written to `--output` as JSON, and `--compare` prints the change against a
+previous results file.
+
+    poetry run python -m benchmarks.suite --compare suite-previous.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from benchmarks.decode import write_recording
+from benchmarks.ingest import make_detections, serve
+
+SEED_BATCH_SIZE = 50_000
+# Interval rows per seeded recording, like a 12 s recording in 3 s segments
+SEED_INTERVALS = 4
+VIEWS = {
+    "home": "/",
+    "detections": "/views/detections",
+    "healthcheck": "/healthcheck",
+}
+
+
+def setup_django(tmp: Path):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "scout.settings")
+    # pylint: disable=import-outside-toplevel
+    import django
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = tmp / "db.sqlite3"
+    settings.CONFIG_VERSION_FILE = tmp / "config.version"
+    django.setup()
+
+    from django.core.management import call_command
+    from django.core.wsgi import get_wsgi_application
+    from web import models
+
+    call_command("migrate", verbosity=0)
+    config = models.Config.config.get_config()
+    # Keep the location lookup out of the timings
+    config.location = {"source": "manual", "lat": 0, "lon": 0}
+    config.save()
+    return serve(get_wsgi_application())
+
+
+def seed(rows: int, days: int, species: int):
+    """
+    Insert `rows` detections spread evenly over the last `days` days and
+    rebuild the daily rollup from them.
+    """
+    # pylint: disable=import-outside-toplevel
+    from django.db import connection, transaction
+    from web import models
+
+    rng = random.Random(0)
+    ids = list(
+        models.Species.species.get_ids(
+            {f"Genus species{i}": f"Bird {i}" for i in range(species)}
+        ).values()
+    )
+    fields = [f for f in models.Detection._meta.concrete_fields if not f.primary_key]
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        models.Detection._meta.db_table,
+        ", ".join(connection.ops.quote_name(f.column) for f in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+    adapt = connection.ops.adapt_datetimefield_value
+
+    now = datetime.now(timezone.utc)
+    recordings = max(rows // SEED_INTERVALS, 1)
+    step = days * 86400 / recordings
+    created_at = adapt(now)
+    for offset in range(0, rows, SEED_BATCH_SIZE):
+        batch = []
+        for i in range(offset, min(offset + SEED_BATCH_SIZE, rows)):
+            start = now - timedelta(seconds=(i // SEED_INTERVALS + 1) * step)
+            interval = i % SEED_INTERVALS * 3.0
+            values = {
+                "recording_start": adapt(start),
+                "recording_end": adapt(start + timedelta(seconds=12)),
+                "interval_start": interval,
+                "interval_end": interval + 3.0,
+                "species": rng.choice(ids),
+                "audio_confidence": rng.uniform(0.5, 1),
+                "location_confidence": rng.random(),
+                "location": None,
+                "created_at": created_at,
+            }
+            batch.append([values[f.name] for f in fields])
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+    models.DailySpeciesSummary.summaries.rebuild()
+
+
+def percentiles(latencies: list[float]) -> dict:
+    """
+    Median, 95th and 99th percentile in milliseconds.
+    """
+    latencies = sorted(latencies)
+    return {
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def bench_analyzer(args: argparse.Namespace, results):
+    with tempfile.TemporaryDirectory() as tmp:
+        # pylint: disable=import-outside-toplevel
+        import analyzer
+        from loguru import logger
+
+        analyzer.API_URL = setup_django(Path(tmp))
+        analyzer.recordings_dir = Path(tmp) / "recordings"
+        analyzer.recordings_dir.mkdir()
+        logger.remove()
+
+        def write_recordings(count: int, first: int):
+            for i in range(first, first + count):
+                name = f"{1_700_000_000 + i * args.duration}_{args.duration}.wav"
+                write_recording(
+                    analyzer.recordings_dir / name, args.sample_rate, args.duration
+                )
+
+        # Load the model and warm up connections outside the timing
+        write_recordings(1, 0)
+        analyzer.analyze(batch_size=args.analyzer_batch_size)
+
+        write_recordings(args.clips, 1)
+        start = time.perf_counter()
+        analyzer.analyze(batch_size=args.analyzer_batch_size)
+        seconds = time.perf_counter() - start
+        results.put(
+            {
+                "clips_per_second": args.clips / seconds,
+                "realtime_factor": args.clips * args.duration / seconds,
+            }
+        )
+
+
+def post(session, url: str, detections: list[dict], ndjson: bool):
+    headers = {"X-CSRFToken": session.cookies.get("csrftoken")}
+    if ndjson:
+        data = "\n".join(json.dumps(detection) for detection in detections)
+        headers["Content-Type"] = "application/x-ndjson"
+    else:
+        data = json.dumps(detections)
+        headers["Content-Type"] = "application/json"
+    session.post(url, data=data, headers=headers, timeout=30).raise_for_status()
+
+
+def bench_table(rows: int, args: argparse.Namespace, results):
+    with tempfile.TemporaryDirectory() as tmp:
+        import requests  # pylint: disable=import-outside-toplevel
+
+        url = setup_django(Path(tmp))
+        started = time.perf_counter()
+        seed(rows, args.days, args.species)
+        seed_seconds = time.perf_counter() - started
+
+        session = requests.Session()
+        session.get(f"{url}/api/config", timeout=5)  # picks up the CSRF cookie
+
+        views = {}
+        for name, path in VIEWS.items():
+            session.get(url + path, timeout=30)  # warm up caches
+            latencies = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                session.get(url + path, timeout=30).raise_for_status()
+                latencies.append(time.perf_counter() - started)
+            views[name] = percentiles(latencies)
+
+        ingest = {}
+        for name, ndjson in (("api/detections", False), ("api/detections/bulk", True)):
+            post(session, f"{url}/{name}", make_detections(1), ndjson)
+            batches = [make_detections(args.batch_size) for _ in range(args.batches)]
+            started = time.perf_counter()
+            for batch in batches:
+                post(session, f"{url}/{name}", batch, ndjson)
+            seconds = time.perf_counter() - started
+            ingest[name] = {"rows_per_second": args.batches * args.batch_size / seconds}
+
+        results.put({"seed_seconds": seed_seconds, "ingest": ingest, "views": views})
+
+
+def run(target, *args):
+    # Every stage gets its own Django setup and process caches, so run it in a
+    # fresh process
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=target, args=(*args, results))
+    process.start()
+    # A stage that crashes never puts a result, so don't wait on it forever
+    while True:
+        try:
+            result = results.get(timeout=1)
+            break
+        except queue.Empty:
+            # An exited process has flushed what it put, so an empty queue is final
+            if not process.is_alive() and results.empty():
+                raise RuntimeError(  # pylint: disable=raise-missing-from
+                    f"{target.__name__} exited with code {process.exitcode}"
+                )
+    process.join()
+    return result
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            cwd=Path(__file__).parent,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    metrics = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            metrics[prefix + key] = value
+    return metrics
+
+
+def compare(previous: dict, current: dict):
+    before = flatten(previous["results"])
+    after = flatten(current["results"])
+    print(f"\nCompared to {previous['meta']['revision']} ({previous['meta']['date']})")
+    for metric, value in after.items():
+        if metric not in before:
+            continue
+        old = before[metric]
+        change = (value - old) / old * 100 if old else 0
+        print(f"{metric:<48} {old:12.2f} -> {value:12.2f}  {change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[10_000],
+        help="seeded detections table sizes, e.g. 10000 1000000 10000000",
+    )
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--species", type=int, default=150)
+    parser.add_argument("--clips", type=int, default=20)
+    parser.add_argument("--duration", type=int, default=12)
+    parser.add_argument("--sample-rate", type=int, default=48000)
+    parser.add_argument("--analyzer-batch-size", type=int, default=8)
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--skip-analyzer", action="store_true")
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path, help="previous results file")
+    args = parser.parse_args()
+
+    now = datetime.now().astimezone()
+    output = args.output or Path(f"suite-{now:%Y%m%d-%H%M%S}.json")
+    results: dict = {}
+
+    if not args.skip_analyzer:
+        results["analyzer"] = run(bench_analyzer, args)
+        print(
+            "analyzer  {clips_per_second:8.2f} clips/s  "
+            "{realtime_factor:8.1f}x realtime".format(**results["analyzer"])
+        )
+
+    for rows in args.rows:
+        result = run(bench_table, rows, args)
+        results[f"rows_{rows}"] = result
+        print(f"{rows} detections, seeded in {result['seed_seconds']:.1f} s")
+        for name, ingest in result["ingest"].items():
+            print(f"  {name:<20} {ingest['rows_per_second']:10.0f} rows/s")
+        for name, latency in result["views"].items():
+            print(
+                f"  {name:<20} "
+                "p50 {p50:8.2f} ms  p95 {p95:8.2f} ms  p99 {p99:8.2f} ms".format(
+                    **latency
+                )
+            )
+
+    report = {
+        "meta": {
+            "date": now.isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {
+                key: str(value) if isinstance(value, Path) else value
+                for key, value in vars(args).items()
+            },
+        },
+        "results": results,
+    }
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(json.loads(args.compare.read_text()), report)
+
+
+if __name__ == "__main__":
+    main()
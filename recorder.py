@@ -0,0 +1,338 @@
+"""Record audio and stream it straight into the BirdNET analyzer without WAV files on disk."""
+
+import argparse
+import signal
+import subprocess
+import threading
+import wave
+from datetime import datetime
+from pathlib import Path
+from typing import IO
+
+import numpy as np
+from loguru import logger
+
+from analyzer import (
+    AnalysisContext,
+    ApiClient,
+    DetectionSpool,
+    Segment,
+    SlidingWindow,
+    cache_dir,
+    get_model,
+    predict_segments,
+    send_heartbeat,
+)
+
+
+SAMPLE_WIDTH = 2  # S16_LE
+BUFFER_SECONDS = 0.5
+
+
+class RingBuffer:
+    """
+    Fixed-size buffer of mono float32 samples shared between the capture thread
+    and the analyzer. When the analyzer falls behind the oldest samples are
+    overwritten.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.closed = False
+        self.dropped = 0
+        self._buffer = np.zeros(capacity, dtype=np.float32)
+        self._start = 0
+        self._size = 0
+        self._lock = threading.Condition()
+
+    def write(self, samples: np.ndarray):
+        with self._lock:
+            samples = samples[-self.capacity :]
+            overflow = self._size + len(samples) - self.capacity
+            if overflow > 0:
+                self._start = (self._start + overflow) % self.capacity
+                self._size -= overflow
+                self.dropped += overflow
+
+            end = (self._start + self._size) % self.capacity
+            first = min(len(samples), self.capacity - end)
+            self._buffer[end : end + first] = samples[:first]
+            self._buffer[: len(samples) - first] = samples[first:]
+            self._size += len(samples)
+            self._lock.notify()
+
+    def read(self, size: int) -> np.ndarray | None:
+        """
+        Block until `size` samples are available and return them. Once the buffer
+        is closed, returns whatever is left, or None when it is empty.
+        """
+        with self._lock:
+            self._lock.wait_for(lambda: self._size >= size or self.closed)
+            size = min(size, self._size)
+            if size == 0:
+                return None
+
+            indices = (self._start + np.arange(size)) % self.capacity
+            samples = self._buffer[indices]
+            self._start = (self._start + size) % self.capacity
+            self._size -= size
+            return samples
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            self._lock.notify_all()
+
+
+def open_source(source: str, rate: int) -> tuple[IO[bytes], subprocess.Popen | None]:
+    """
+    Open a stream of raw S16_LE mono samples. `arecord` and `pulse` capture from
+    the sound card; anything else is a path to a raw PCM file, FIFO or WAV file.
+    """
+    if source == "arecord":
+        command = ["arecord", "-q", "-t", "raw", "-f", "S16_LE", "-c", "1"]
+        command += ["-r", str(rate)]
+    elif source == "pulse":
+        command = ["parec", "--format=s16le", "--channels=1", f"--rate={rate}"]
+    else:
+        return open(source, "rb"), None  # pylint: disable=consider-using-with
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    assert process.stdout is not None
+    return process.stdout, process
+
+
+class OverlapMerger:
+    """
+    Collapses overlapping windows into one score row per model-length step,
+    keeping each species' highest score, so a call heard in several windows is
+    counted once like in the file-based analyzer.
+
+    A step is the interval of the window that opens it and takes in every
+    window starting inside it. It is complete once the next window, `step`
+    seconds later, can no longer start inside it, which is right away without
+    overlap.
+    """
+
+    def __init__(self, step: float):
+        self.step = step
+        self.interval: tuple[float, float] | None = None
+        self.scores = np.zeros(0)
+
+    def add(
+        self, interval: tuple[float, float], scores: np.ndarray
+    ) -> list[tuple[tuple[float, float], np.ndarray]]:
+        """
+        Add a window's scores and return the steps that are now complete.
+        """
+        # A window past the end of the open step, e.g. after a gap, closes it
+        done = self.flush() if self.ends_before(interval[0]) else []
+        if self.interval is None:
+            self.interval, self.scores = interval, scores
+        else:
+            self.scores = np.maximum(self.scores, scores)
+        if self.ends_before(interval[0] + self.step):
+            done += self.flush()
+        return done
+
+    def ends_before(self, time: float) -> bool:
+        return self.interval is not None and time >= self.interval[1] - 1e-6
+
+    def flush(self) -> list[tuple[tuple[float, float], np.ndarray]]:
+        """
+        Return the open step, complete or not.
+        """
+        if self.interval is None:
+            return []
+        done = [(self.interval, self.scores)]
+        self.interval = None
+        return done
+
+
+class StreamRecorder:
+    """
+    Captures audio into a ring buffer and analyzes fixed-length clips straight
+    from memory. Clips are only written to disk when `keep_dir` is set and the
+    clip had detections.
+
+    Clips are fed through a `SlidingWindow`, so calls that straddle two clips
+    are still analyzed as a whole and detections carry absolute times. With
+    `overlap`, an `OverlapMerger` folds the overlapping windows back into one
+    detection per species and step.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        rate: int = 48000,
+        duration: int = 12,
+        keep_dir: Path | None = None,
+        overlap: float = 0.0,
+    ):
+        self.source = source
+        self.rate = rate
+        self.duration = duration
+        self.keep_dir = keep_dir
+        self.window = SlidingWindow(get_model(), overlap)
+        self.merger = OverlapMerger(self.window.step / self.window.sample_rate)
+        self.buffer = RingBuffer(0)
+        self.stopping = threading.Event()
+        self.client = ApiClient()
+        self.spool = DetectionSpool(cache_dir / "recorder-spool.sqlite3")
+        self.process: subprocess.Popen | None = None
+
+    def stop(self, *args):
+        if not self.stopping.is_set():
+            logger.info("Stopping recorder...")
+        self.stopping.set()
+        self.buffer.close()
+        if self.process is not None:
+            self.process.terminate()
+
+    def capture(self, stream: IO[bytes]):
+        frame_size = int(self.rate * BUFFER_SECONDS) * SAMPLE_WIDTH
+        try:
+            if self.source.endswith(".wav"):
+                with wave.open(stream, "rb") as wav:
+                    while not self.stopping.is_set() and (
+                        data := wav.readframes(frame_size // SAMPLE_WIDTH)
+                    ):
+                        self.write(data)
+            else:
+                while not self.stopping.is_set() and (data := stream.read(frame_size)):
+                    self.write(data)
+        finally:
+            stream.close()
+            self.buffer.close()
+
+    def write(self, data: bytes):
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+        self.buffer.write(samples)
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        if self.source.endswith(".wav"):
+            with wave.open(self.source, "rb") as wav:
+                if wav.getnchannels() != 1 or wav.getsampwidth() != SAMPLE_WIDTH:
+                    raise ValueError(f"{self.source} must be 16-bit mono")
+                self.rate = wav.getframerate()
+
+        self.buffer = RingBuffer(self.rate * self.duration * 4)
+        stream, self.process = open_source(self.source, self.rate)
+        started_at = datetime.now().timestamp()
+        self.spool.start()
+        threading.Thread(target=self.capture, args=(stream,), daemon=True).start()
+        logger.info(f"Streaming {self.duration}s clips from {self.source}")
+
+        recorded = 0
+        while not self.stopping.is_set():
+            clip = self.buffer.read(self.rate * self.duration)
+            if self.stopping.is_set():
+                break
+            if clip is None:
+                # End of the source, analyze what is left of the last window
+                self.analyze(self.window.flush(), final=True)
+                break
+            if self.buffer.dropped:
+                logger.warning(
+                    f"Analyzer fell behind, dropped {self.buffer.dropped / self.rate:.1f}s of audio"
+                )
+                recorded += self.buffer.dropped
+                self.buffer.dropped = 0
+                self.window.reset(started_at + recorded / self.rate)
+
+            clip_start = started_at + recorded / self.rate
+            recorded += len(clip)
+            try:
+                self.analyze(
+                    self.window.push(clip, self.rate, clip_start), clip, clip_start
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.exception(e)
+            send_heartbeat("recorder", spool_depth=self.spool.depth())
+
+        self.spool.stop()
+        logger.info("Recorder stopped")
+
+    def analyze(
+        self,
+        segments: list[Segment],
+        clip: np.ndarray | None = None,
+        clip_start: float | None = None,
+        final: bool = False,
+    ):
+        model = get_model()
+        steps = []
+        if segments:
+            predictions = predict_segments(segments, model)
+            for key, interval, _ in segments:
+                steps += self.merger.add(interval, predictions[key][interval])
+        if final:
+            steps += self.merger.flush()
+        if not steps:
+            return
+
+        context = AnalysisContext(self.client.get_config(), prefetch=True)
+        labels = tuple(model.species)
+        detections = []
+        for (start, end), scores in steps:
+            # Each step is its own recording, so intervals start at zero and
+            # the absolute time is carried by recording_start/recording_end
+            detections += context.filter_predictions(
+                start, end, {(0.0, round(end - start, 3)): scores}, labels
+            )
+
+        # Windows can start in the previous clip, name the clip after its audio
+        start = steps[0][0][0] if clip_start is None else clip_start
+        filename = f"{int(start)}_{self.duration}.wav"
+        self.spool.post_detections(filename, detections)
+
+        if detections and clip is not None and self.keep_dir is not None:
+            self.save_clip(filename, clip)
+
+    def save_clip(self, filename: str, clip: np.ndarray):
+        assert self.keep_dir is not None
+        self.keep_dir.mkdir(parents=True, exist_ok=True)
+        pcm = (np.clip(clip, -1, 1) * 32767).astype("<i2")
+        with wave.open(str(self.keep_dir / filename), "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(SAMPLE_WIDTH)
+            wav.setframerate(self.rate)
+            wav.writeframes(pcm.tobytes())
+        logger.debug(f"Kept clip {filename}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--source",
+        default="arecord",
+        help="arecord, pulse, or a path to a raw S16_LE mono PCM file, FIFO or WAV file",
+    )
+    parser.add_argument("--rate", type=int, default=48000, help="Sample rate in Hz")
+    parser.add_argument(
+        "--duration", type=int, default=12, help="Seconds of audio per clip"
+    )
+    parser.add_argument(
+        "--overlap",
+        type=float,
+        default=0.0,
+        help="Seconds of overlap between consecutive 3 second analysis windows",
+    )
+    parser.add_argument(
+        "--keep-dir",
+        type=Path,
+        default=None,
+        help="Save clips with detections to this directory",
+    )
+    args = parser.parse_args()
+
+    StreamRecorder(
+        args.source, args.rate, args.duration, args.keep_dir, args.overlap
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 #!/bin/bash
 
+# RECORDER_MODE=stream pipes audio straight into the analyzer (see recorder.py)
+# instead of writing WAV files for analyzer.sh to pick up.
+RECORDER_MODE="${RECORDER_MODE:-files}"
+
 echo "Checking for audio devices..."
 if ! arecord -l | grep -q "card"; then
     echo "Error: No audio devices found!" >&2
@@ -8,6 +12,13 @@ if ! arecord -l | grep -q "card"; then
     exit 1
 fi
 
+if [ "$RECORDER_MODE" = "stream" ]; then
+    echo "Starting streaming recorder process..."
+    exec poetry run python -m recorder --source arecord \
+        --rate "${RECORDER_RATE:-48000}" \
+        --overlap "${RECORDER_OVERLAP:-0}"
+fi
+
 # Directory for recordings
 RECORDINGS_DIR="recordings"
 mkdir -p "$RECORDINGS_DIR"
@@ -15,9 +26,11 @@ mkdir -p "/tmp/birdnet/$RECORDINGS_DIR"
 
 # Recording parameters
 DURATION=12
-FORMAT="cd"
+FORMAT="S16_LE"
 CHANNELS=1
-RATE=44100
+# BirdNET runs at 48 kHz; recording at that rate lets the analyzer skip
+# resampling. Set RECORDER_RATE=44100 for devices that can't record at 48 kHz.
+RATE="${RECORDER_RATE:-48000}"
 
 echo "Starting recorder process..."
 
@@ -76,10 +76,31 @@ WSGI_APPLICATION = "scout.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# The web app reads while the analyzer writes detections, possibly from
+# another process. WAL (switched on by migration 0007, it is kept in the
+# database file) lets readers and the writer run concurrently,
+# IMMEDIATE transactions take the write lock up front so writers wait out the
+# busy timeout instead of failing with "database is locked" on a lock upgrade.
+SQLITE_OPTIONS = {
+    "timeout": 20,
+    "transaction_mode": "IMMEDIATE",
+    "init_command": ";".join(
+        [
+            "PRAGMA synchronous=NORMAL",
+            "PRAGMA cache_size=-32000",
+            "PRAGMA mmap_size=134217728",
+            "PRAGMA temp_store=MEMORY",
+        ]
+    ),
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": SQLITE_OPTIONS,
     }
 }
 
@@ -125,3 +146,22 @@ STATICFILES_DIR = [BASE_DIR / "static"]
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Stamp rewritten whenever the Config changes, so every process caching the
+# Config (web workers, analyzers writing to the database) notices the change
+CONFIG_VERSION_FILE = BASE_DIR / "cache" / "config.version"
+
+# Moves the version stamp to a temporary directory while tests run
+TEST_RUNNER = "scout.test_runner.TestRunner"
+
+# Public IP and IP geolocation endpoints used to locate the node. `{ip}` is
+# replaced with the public IP address.
+LOCATION_IP_URL = os.getenv("BIRDNET_SCOUT_IP_URL", "https://api.ipify.org")
+LOCATION_GEO_URL = os.getenv("BIRDNET_SCOUT_GEO_URL", "http://ip-api.com/json/{ip}")
+# Seconds a resolved location is reused, and before retrying a failed lookup
+LOCATION_TTL = 6 * 60 * 60
+LOCATION_RETRY_AFTER = 15 * 60
+
+# Days of raw detections kept. Older detections are compacted into the daily
+# species rollup, which is all the pages read.
+DETECTION_RETENTION_DAYS = int(os.getenv("BIRDNET_SCOUT_RETENTION_DAYS", "30"))
@@ -0,0 +1,21 @@
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the tests with the config version stamp in a throwaway directory, so
+    test runs never write into the checkout's cache directory.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        settings.CONFIG_VERSION_FILE = Path(self.cache_dir.name) / "config.version"
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
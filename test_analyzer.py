@@ -0,0 +1,167 @@
+import importlib.util
+import tempfile
+import threading
+import time
+import unittest
+import wave
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+if importlib.util.find_spec("birdnet") is None:
+    raise unittest.SkipTest("birdnet is not installed")
+
+# pylint: disable=wrong-import-position
+import analyzer
+from analyzer import RecordingQueue, RecordingWatcher, predict_recordings
+
+
+class RecordingQueueTests(unittest.TestCase):
+    def test_batches_are_oldest_first(self):
+        queue = RecordingQueue()
+        for name in ["1700000024_12.wav", "1700000000_12.wav", "1700000012_12.wav"]:
+            queue.put(name)
+
+        self.assertEqual(
+            queue.get_batch(2, timeout=0), ["1700000000_12.wav", "1700000012_12.wav"]
+        )
+        self.assertEqual(queue.get_batch(2, timeout=0), ["1700000024_12.wav"])
+
+    def test_get_batch_waits_up_to_timeout(self):
+        queue = RecordingQueue()
+
+        start = time.monotonic()
+        self.assertEqual(queue.get_batch(8, timeout=0.1), [])
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+        threading.Timer(0.05, queue.put, ["1700000000_12.wav"]).start()
+        self.assertEqual(queue.get_batch(8, timeout=5), ["1700000000_12.wav"])
+
+    def test_recording_is_queued_once_until_done(self):
+        queue = RecordingQueue(maxsize=1)
+        self.assertTrue(queue.put("1700000000_12.wav"))
+        self.assertFalse(queue.put("1700000012_12.wav"))
+        self.assertTrue(queue.overflowed)
+
+        queue.get_batch(1, timeout=0)
+        queue.put("1700000000_12.wav")
+        self.assertEqual(len(queue), 0)
+
+        queue.task_done("1700000000_12.wav")
+        queue.put("1700000000_12.wav")
+        self.assertEqual(len(queue), 1)
+
+
+class RecordingWatcherTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.recordings_dir = Path(tmp.name)
+        patcher = mock.patch.object(analyzer, "recordings_dir", self.recordings_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def watch(self, **kwargs) -> RecordingQueue:
+        queue = RecordingQueue()
+        stopping = threading.Event()
+        self.addCleanup(stopping.set)
+        RecordingWatcher(queue, stopping, **kwargs).start()
+        return queue
+
+    def test_queues_existing_and_new_recordings(self):
+        (self.recordings_dir / "1700000012_12.wav").touch()
+        (self.recordings_dir / "notes.txt").touch()
+        queue = self.watch()
+        self.assertEqual(queue.get_batch(8, timeout=5), ["1700000012_12.wav"])
+
+        (self.recordings_dir / "1700000024_12.wav").touch()
+        self.assertEqual(queue.get_batch(8, timeout=5), ["1700000024_12.wav"])
+
+    def test_polls_without_inotify(self):
+        with mock.patch.object(analyzer, "inotify_watch", return_value=None):
+            queue = self.watch(poll_interval=0.05)
+            self.assertEqual(queue.get_batch(8, timeout=0.2), [])
+
+            (self.recordings_dir / "1700000000_12.wav").touch()
+            self.assertEqual(queue.get_batch(8, timeout=5), ["1700000000_12.wav"])
+
+
+class DecodeFailureTests(unittest.TestCase):
+    def test_undecodable_recording_is_quarantined(self):
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(analyzer, "recordings_dir", Path(tmp)),
+        ):
+            (Path(tmp) / "1700000000_12.wav").write_bytes(b"not a wav file")
+
+            self.assertEqual(predict_recordings(["1700000000_12.wav"], mock.Mock()), {})
+
+            self.assertEqual(analyzer.list_recordings(), [])
+            self.assertTrue((Path(tmp) / "failed" / "1700000000_12.wav").exists())
+
+    def test_recording_without_samples_is_removed(self):
+        model = SimpleNamespace(sample_rate=48000, chunk_size_s=3.0, species=[])
+        context = analyzer.AnalysisContext(
+            {
+                "location": {},
+                "min_audio_confidence": 50,
+                "min_location_confidence": 10,
+            }
+        )
+        client = mock.Mock()
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(analyzer, "recordings_dir", Path(tmp)),
+            mock.patch.object(analyzer, "get_model", return_value=model),
+        ):
+            with wave.open(str(Path(tmp) / "1700000000_12.wav"), "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(48000)
+
+            analyzer.process_recordings(context, client, ["1700000000_12.wav"])
+
+            self.assertEqual(analyzer.list_recordings(), [])
+        client.post_detections.assert_called_once_with("1700000000_12.wav", [])
+
+
+class LocationSpeciesCacheTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = analyzer.LocationSpeciesCache(Path(tmp.name) / "species.json")
+        self.started = threading.Event()
+        self.release = threading.Event()
+        patcher = mock.patch.object(
+            analyzer, "predict_location_species", side_effect=self.predict
+        )
+        self.predict_location_species = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.release.set)
+
+    def predict(self, lat: float, long: float, week: int) -> dict:
+        if week == 2:
+            self.started.set()
+            self.release.wait(5)
+        return {"Turdus migratorius_American Robin": week / 10}
+
+    def test_cached_lookup_does_not_wait_on_a_prefetch(self):
+        self.cache.get(1.0, 2.0, 1)
+        self.cache.prefetch(1.0, 2.0, 2)
+        self.assertTrue(self.started.wait(5))
+
+        start = time.monotonic()
+        self.assertEqual(
+            self.cache.get(1.0, 2.0, 1), {"Turdus migratorius_American Robin": 0.1}
+        )
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_lookup_of_a_prefetching_key_waits_for_its_result(self):
+        self.cache.prefetch(1.0, 2.0, 2)
+        self.assertTrue(self.started.wait(5))
+        threading.Timer(0.05, self.release.set).start()
+
+        self.assertEqual(
+            self.cache.get(1.0, 2.0, 2), {"Turdus migratorius_American Robin": 0.2}
+        )
+        self.assertEqual(self.predict_location_species.call_count, 1)
@@ -0,0 +1,161 @@
+import importlib.util
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+if importlib.util.find_spec("birdnet") is None:
+    raise unittest.SkipTest("birdnet is not installed")
+
+# pylint: disable=wrong-import-position
+from recorder import OverlapMerger, RingBuffer, StreamRecorder
+
+
+class RingBufferTests(unittest.TestCase):
+    def test_reads_across_the_wraparound(self):
+        buffer = RingBuffer(4)
+        buffer.write(np.arange(3, dtype=np.float32))
+        np.testing.assert_array_equal(buffer.read(2), [0, 1])
+
+        buffer.write(np.arange(3, 6, dtype=np.float32))
+
+        np.testing.assert_array_equal(buffer.read(4), [2, 3, 4, 5])
+        self.assertEqual(buffer.dropped, 0)
+
+    def test_full_capacity_write_at_offset_replaces_everything(self):
+        buffer = RingBuffer(4)
+        buffer.write(np.arange(3, dtype=np.float32))
+        buffer.read(1)
+
+        buffer.write(np.arange(10, 14, dtype=np.float32))
+
+        self.assertEqual(buffer.dropped, 2)
+        np.testing.assert_array_equal(buffer.read(4), [10, 11, 12, 13])
+
+    def test_oversized_write_keeps_the_newest_samples(self):
+        buffer = RingBuffer(4)
+        buffer.write(np.arange(6, dtype=np.float32))
+        np.testing.assert_array_equal(buffer.read(4), [2, 3, 4, 5])
+
+    def test_closed_buffer_returns_the_rest_then_none(self):
+        buffer = RingBuffer(4)
+        buffer.write(np.arange(3, dtype=np.float32))
+        buffer.close()
+
+        np.testing.assert_array_equal(buffer.read(4), [0, 1, 2])
+        self.assertIsNone(buffer.read(4))
+
+
+class OverlapMergerTests(unittest.TestCase):
+    def test_overlapping_windows_keep_the_highest_score_per_step(self):
+        merger = OverlapMerger(step=1.0)
+
+        self.assertEqual(merger.add((0.0, 3.0), np.array([0.9, 0.1])), [])
+        self.assertEqual(merger.add((1.0, 4.0), np.array([0.2, 0.3])), [])
+        ((interval, scores),) = merger.add((2.0, 5.0), np.array([0.1, 0.8]))
+
+        self.assertEqual(interval, (0.0, 3.0))
+        np.testing.assert_array_equal(scores, [0.9, 0.8])
+        self.assertEqual(len(merger.add((3.0, 6.0), np.array([0.0, 0.0]))), 0)
+        self.assertEqual(merger.flush()[0][0], (3.0, 6.0))
+        self.assertEqual(merger.flush(), [])
+
+    def test_windows_without_overlap_are_steps_of_their_own(self):
+        merger = OverlapMerger(step=3.0)
+
+        for start in (0.0, 3.0, 6.0):
+            ((interval, _),) = merger.add((start, start + 3), np.ones(2))
+            self.assertEqual(interval, (start, start + 3))
+
+    def test_window_after_a_gap_closes_the_open_step(self):
+        merger = OverlapMerger(step=1.0)
+        merger.add((0.0, 3.0), np.ones(2))
+
+        done = merger.add((10.0, 13.0), np.ones(2))
+
+        self.assertEqual([interval for interval, _ in done], [(0.0, 3.0)])
+        self.assertEqual(merger.interval, (10.0, 13.0))
+
+
+class WindowCollector(StreamRecorder):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.windows: list = []
+
+    def analyze(self, segments, clip=None, clip_start=None, final=False):
+        self.windows += segments
+
+
+class StreamRecorderTests(unittest.TestCase):
+    MODEL = SimpleNamespace(sample_rate=1000, chunk_size_s=1.0, species=[])
+
+    def setUp(self):
+        # Only the capture and windowing run, nothing is analyzed or delivered
+        for target, value in (
+            ("get_model", self.MODEL),
+            ("ApiClient", mock.MagicMock()),
+            ("DetectionSpool", mock.MagicMock()),
+            ("send_heartbeat", mock.MagicMock()),
+            ("signal.signal", mock.MagicMock()),
+        ):
+            patcher = mock.patch(f"recorder.{target}", return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def record(self, samples: np.ndarray, **kwargs) -> list:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "stream.raw"
+            path.write_bytes(samples.astype("<i2").tobytes())
+            recorder = WindowCollector(str(path), rate=1000, duration=3, **kwargs)
+            recorder.run()
+        return recorder.windows
+
+    def test_windows_cover_the_stream_across_clips(self):
+        samples = np.arange(7500) % 1000
+
+        windows = self.record(samples)
+
+        start = windows[0][1][0]
+        self.assertEqual(
+            [round(s - start, 3) for _, (s, _), _ in windows], list(range(8))
+        )
+        audio = np.concatenate([chunk for _, _, chunk in windows])[:7500]
+        np.testing.assert_allclose(audio * 32768, samples)
+        self.assertAlmostEqual(windows[-1][1][1] - windows[-1][1][0], 0.5)
+
+    def test_overlapping_windows_straddle_clips(self):
+        windows = self.record(np.zeros(6000), overlap=0.5)
+
+        start = windows[0][1][0]
+        self.assertEqual(
+            [round(s - start, 3) for _, (s, _), _ in windows][:6],
+            [0, 0.5, 1, 1.5, 2, 2.5],
+        )
+
+    @mock.patch("recorder.AnalysisContext")
+    @mock.patch("recorder.predict_segments")
+    def test_kept_clip_is_named_after_its_own_audio(
+        self, predict_segments, analysis_context
+    ):
+        analysis_context.return_value.filter_predictions.return_value = [{}]
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder = StreamRecorder(
+                "stream.raw", rate=1000, duration=3, keep_dir=Path(tmp), overlap=0.5
+            )
+            # The first window of this clip started in the previous one's tail
+            segments = [
+                ("1699999999.500", (1699999999.5, 1700000000.5), np.zeros(1000)),
+                ("1700000000.000", (1700000000.0, 1700000001.0), np.zeros(1000)),
+            ]
+            predict_segments.return_value = {
+                key: {interval: np.zeros(1)} for key, interval, _ in segments
+            }
+
+            recorder.analyze(segments, np.zeros(3000), clip_start=1700000000.0)
+
+            self.assertEqual(
+                [path.name for path in Path(tmp).iterdir()], ["1700000000_3.wav"]
+            )
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class WebConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "web"
+
+    def ready(self):
+        # Connect the Config and Species cache invalidation receivers
+        from . import signals  # pylint: disable=import-outside-toplevel,unused-import
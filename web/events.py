@@ -0,0 +1,114 @@
+"""
+In-process publish/subscribe used to push events to connected browsers.
+
+Publishers run in request threads, subscribers are either blocking server-sent
+event streams (WSGI, one thread per connection) or async streams on an event
+loop (ASGI). Events only reach subscribers in the same process.
+"""
+
+import asyncio
+import json
+import queue
+import threading
+from typing import TypeVar
+
+
+class Subscription:
+    """
+    Bounded queue of (event, data) pairs for one connected client on a
+    blocking stream. When a client falls behind, new events are dropped rather
+    than blocking the publisher.
+    """
+
+    def __init__(self, maxsize: int):
+        self.dropped = 0
+        self._queue: queue.Queue[tuple[str, dict]] = queue.Queue(maxsize)
+
+    def put(self, event: tuple[str, dict]):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def get(self, timeout: float) -> tuple[str, dict] | None:
+        """
+        Block until the next event, or return None after `timeout` seconds.
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription:
+    """
+    Subscription for a client streamed from an event loop. Events are handed
+    to the loop's thread, as asyncio queues are not thread-safe.
+    """
+
+    def __init__(self, maxsize: int, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.dropped = 0
+        self._queue: asyncio.Queue[tuple[str, dict]] = asyncio.Queue(maxsize)
+
+    def put(self, event: tuple[str, dict]):
+        self.loop.call_soon_threadsafe(self._put_nowait, event)
+
+    def _put_nowait(self, event: tuple[str, dict]):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def aget(self, timeout: float) -> tuple[str, dict] | None:
+        """
+        Wait for the next event, or return None after `timeout` seconds.
+        """
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+SubscriptionT = TypeVar("SubscriptionT", Subscription, AsyncSubscription)
+
+
+class EventBroker:
+    def __init__(self, maxsize: int = 100):
+        self.maxsize = maxsize
+        self._subscriptions: set[Subscription | AsyncSubscription] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self) -> Subscription:
+        return self._add(Subscription(self.maxsize))
+
+    def subscribe_async(self, loop: asyncio.AbstractEventLoop) -> AsyncSubscription:
+        return self._add(AsyncSubscription(self.maxsize, loop))
+
+    def _add(self, subscription: SubscriptionT) -> SubscriptionT:
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription | AsyncSubscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event: str, data: dict):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.put((event, data))
+
+
+def format_event(event: str, data: dict) -> str:
+    """
+    Frame an event for a text/event-stream response.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+broker = EventBroker()
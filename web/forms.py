@@ -1,5 +1,7 @@
 from django import forms
 
+from . import models
+
 
 class SettingsForm(forms.Form):
     min_audio_confidence = forms.IntegerField(
@@ -16,3 +18,50 @@ class SettingsForm(forms.Form):
         label="Min Location Score",
         help_text="0-90 valid; Recommend at least 1 for better predictions",
     )
+    latitude = forms.FloatField(
+        required=False,
+        max_value=90,
+        min_value=-90,
+        label="Latitude",
+        help_text="Fixed location; leave empty to locate from the public IP",
+    )
+    longitude = forms.FloatField(
+        required=False,
+        max_value=180,
+        min_value=-180,
+        label="Longitude",
+        help_text="Fixed location; leave empty to locate from the public IP",
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if (cleaned_data.get("latitude") is None) != (
+            cleaned_data.get("longitude") is None
+        ):
+            raise forms.ValidationError("Set both latitude and longitude, or neither")
+        return cleaned_data
+
+
+class DetectionForm(forms.Form):
+    """
+    Validates one detection posted by an analyzer.
+    """
+
+    recording_start = forms.DateTimeField()
+    recording_end = forms.DateTimeField()
+    interval = forms.CharField(max_length=50)
+    scientific_name = forms.CharField(max_length=200)
+    common_name = forms.CharField(max_length=200)
+    audio_confidence = forms.FloatField(min_value=0, max_value=1)
+    location_confidence = forms.FloatField(min_value=0, max_value=1)
+    location = forms.CharField(required=False)
+
+    def clean_interval(self):
+        try:
+            models.parse_interval(self.cleaned_data["interval"])
+        except ValueError as e:
+            raise forms.ValidationError("Expected <start>,<end> in seconds") from e
+        return self.cleaned_data["interval"]
+
+    def clean_location(self):
+        return self.cleaned_data["location"] or None
@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import close_old_connections
+
+from web.services import RetentionService
+
+
+class Command(BaseCommand):
+    help = (
+        "Compact detections older than the retention window into the daily "
+        "species rollup and delete them"
+    )
+
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.DETECTION_RETENTION_DAYS,
+            help="Days of raw detections to keep, including today",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Detections deleted per transaction",
+        )
+        parser.add_argument(
+            "--every",
+            type=float,
+            default=None,
+            help="Keep running and compact again every this many seconds",
+        )
+
+    def handle(self, *args, **options):
+        service = RetentionService(options["days"], chunk_size=options["chunk_size"])
+
+        while True:
+            stats = service.run()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Compacted {stats['days']} days, "
+                    f"deleted {stats['deleted']} detections"
+                )
+            )
+            if options["every"] is None:
+                return
+
+            close_old_connections()
+            try:
+                time.sleep(options["every"])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,21 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from web import models
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily species rollup from the detections table"
+
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            default=None,
+            help="Only rebuild dates on or after this YYYY-MM-DD date",
+        )
+
+    def handle(self, *args, **options):
+        count = models.DailySpeciesSummary.summaries.rebuild(options["since"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily summaries"))
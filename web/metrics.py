@@ -0,0 +1,239 @@
+"""
+Process-local counters, gauges and histograms, rendered in the Prometheus text
+format on /metrics.
+
+Recording a sample is a dictionary lookup and an addition under a lock, so hot
+paths can time themselves with `with histogram.time(stage="decode"):`. Nothing
+here depends on Django: the analyzer keeps its own registry and sends a
+snapshot of it with every heartbeat, which the web app renders next to its
+own metrics.
+"""
+
+import bisect
+import threading
+import time
+from typing import Iterable
+
+# Seconds, from a fast query up to a slow batch of recordings
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metric:
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        registry: "Registry | None" = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def key(self, labels: dict) -> tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def empty(self) -> list[float]:
+        return [0.0]
+
+    def add(self, key: tuple[str, ...], values: list[float]):
+        with self._lock:
+            current = self._values.setdefault(key, self.empty())
+            for i, value in enumerate(values):
+                current[i] += value
+
+    def snapshot(self, reset: bool = False) -> dict:
+        with self._lock:
+            values = [[list(key), list(value)] for key, value in self._values.items()]
+            if reset:
+                self._values.clear()
+        return {
+            "kind": self.kind,
+            "documentation": self.documentation,
+            "labelnames": list(self.labelnames),
+            "values": values,
+        }
+
+    def format_labels(self, key: tuple[str, ...], **extra) -> str:
+        labels = {**dict(zip(self.labelnames, key)), **extra}
+        if not labels:
+            return ""
+        return (
+            "{"
+            + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items())
+            + "}"
+        )
+
+    def samples(self, key: tuple[str, ...], values: list[float]) -> list[str]:
+        return [f"{self.name}{self.format_labels(key)} {values[0]:g}"]
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted((key, list(value)) for key, value in self._values.items())
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for key, value in values:
+            lines += self.samples(key, value)
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        self.add(self.key(labels), [amount])
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self.key(labels)
+        with self._lock:
+            self._values[key] = [value]
+
+    def add(self, key: tuple[str, ...], values: list[float]):
+        # Merged snapshots carry the latest reading, not an increment
+        with self._lock:
+            self._values[key] = list(values)
+
+
+class Histogram(Metric):
+    """
+    Counts observations into cumulative `buckets` and tracks their sum.
+    Stored per label set as the count of each bucket, the overflow count and
+    the sum.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+        registry: "Registry | None" = None,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def empty(self) -> list[float]:
+        return [0.0] * (len(self.buckets) + 2)
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = self.empty()
+            values[index] += 1
+            values[-1] += value
+
+    def time(self, **labels) -> "Timer":
+        """
+        Context manager observing the seconds spent in its block.
+        """
+        return Timer(self, labels)
+
+    def snapshot(self, reset: bool = False) -> dict:
+        return {**super().snapshot(reset), "buckets": list(self.buckets)}
+
+    def samples(self, key: tuple[str, ...], values: list[float]) -> list[str]:
+        lines = []
+        count = 0.0
+        bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+        for bound, bucket in zip(bounds, values):
+            count += bucket
+            labels = self.format_labels(key, le=bound)
+            lines.append(f"{self.name}_bucket{labels} {count:g}")
+        lines.append(f"{self.name}_sum{self.format_labels(key)} {values[-1]:g}")
+        lines.append(f"{self.name}_count{self.format_labels(key)} {count:g}")
+        return lines
+
+
+class Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+KINDS: dict[str, type[Metric]] = {
+    "counter": Counter,
+    "gauge": Gauge,
+    "histogram": Histogram,
+}
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """
+        JSON-serializable state of every metric, optionally starting over.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot(reset) for metric in metrics}
+
+    def merge(self, snapshot: dict):
+        """
+        Add the samples of another registry's `snapshot`, creating the metrics
+        it has and this one doesn't.
+        """
+        for name, family in snapshot.items():
+            metric = self._metrics.get(name)
+            if metric is None:
+                options = {"buckets": family["buckets"]} if "buckets" in family else {}
+                metric = KINDS[family["kind"]](
+                    name,
+                    family["documentation"],
+                    family["labelnames"],
+                    registry=self,
+                    **options,
+                )
+            for key, values in family["values"]:
+                metric.add(tuple(key), values)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
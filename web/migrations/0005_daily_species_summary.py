@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:21
+
+import django.db.models.manager
+from dateutil.tz import tzlocal
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_summaries(apps, schema_editor):
+    Detection = apps.get_model("web", "Detection")
+    DailySpeciesSummary = apps.get_model("web", "DailySpeciesSummary")
+
+    timezone.activate(tzlocal())
+    totals = (
+        Detection.detections.annotate(date=TruncDate("recording_start"))
+        .values("date", "scientific_name")
+        .annotate(
+            common_name=Max("common_name"),
+            sample_count=Count("id"),
+            audio_confidence_sum=Sum("audio_confidence"),
+            location_confidence=Max("location_confidence"),
+            last_detected_at=Max("recording_start"),
+        )
+        .order_by()
+    )
+    DailySpeciesSummary.summaries.bulk_create(
+        (DailySpeciesSummary(**row) for row in totals.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("web", "0004_remove_config_timezone"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySpeciesSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("scientific_name", models.CharField(max_length=200)),
+                ("common_name", models.CharField(max_length=200)),
+                ("sample_count", models.PositiveIntegerField(default=0)),
+                ("audio_confidence_sum", models.FloatField(default=0)),
+                ("location_confidence", models.FloatField(default=0)),
+                ("last_detected_at", models.DateTimeField()),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "scientific_name"),
+                        name="unique_daily_species_summary",
+                    )
+                ],
+            },
+            managers=[
+                ("summaries", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("web", "0005_daily_species_summary"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="dailyspeciessummary",
+            index=models.Index(
+                fields=["last_detected_at"], name="summary_last_detected_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dailyspeciessummary",
+            index=models.Index(
+                fields=["scientific_name", "sample_count"],
+                name="summary_species_count_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="detection",
+            index=models.Index(
+                fields=["recording_start", "scientific_name"],
+                name="detection_start_species_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # WAL is persisted in the database file, so it is switched on once here
+    # rather than on every connection, which would need an exclusive lock.
+    # PRAGMA journal_mode cannot change inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("web", "0006_detection_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "PRAGMA journal_mode=WAL",
+            reverse_sql="PRAGMA journal_mode=DELETE",
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Lets retention hand freed pages back with PRAGMA incremental_vacuum.
+    # Changing auto_vacuum on an existing database only takes effect after a
+    # full VACUUM, which cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("web", "0007_enable_wal"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            ["PRAGMA auto_vacuum=INCREMENTAL", "VACUUM"],
+            reverse_sql=["PRAGMA auto_vacuum=NONE", "VACUUM"],
+        ),
+    ]
@@ -0,0 +1,108 @@
+import django.db.models.deletion
+import django.db.models.manager
+from django.db import migrations, models
+from django.db.models import FloatField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, StrIndex, Substr
+
+
+def normalize_detections(apps, schema_editor):
+    Species = apps.get_model("web", "Species")
+    Detection = apps.get_model("web", "Detection")
+    DailySpeciesSummary = apps.get_model("web", "DailySpeciesSummary")
+
+    names: dict[str, str] = {}
+    for queryset in (Detection.detections, DailySpeciesSummary.summaries):
+        rows = (
+            queryset.values("scientific_name")
+            .annotate(name=Max("common_name"))
+            .values_list("scientific_name", "name")
+            .order_by()
+        )
+        for scientific_name, common_name in rows:
+            names.setdefault(scientific_name, common_name)
+    Species.species.bulk_create(
+        (Species(scientific_name=s, common_name=c) for s, c in names.items()),
+        batch_size=500,
+    )
+
+    # One pass over each table, the species lookups use the unique index
+    species_id = Subquery(
+        Species.species.filter(scientific_name=OuterRef("scientific_name")).values(
+            "id"
+        )[:1]
+    )
+    Detection.detections.update(species_id=species_id)
+    DailySpeciesSummary.summaries.update(species_id=species_id)
+
+    comma = StrIndex("interval", Value(","))
+    Detection.detections.update(
+        interval_start=Cast(Substr("interval", 1, comma - 1), FloatField()),
+        interval_end=Cast(Substr("interval", comma + 1), FloatField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("web", "0008_incremental_vacuum"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Species",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("scientific_name", models.CharField(max_length=200, unique=True)),
+                ("common_name", models.CharField(max_length=200)),
+            ],
+            options={
+                "verbose_name_plural": "species",
+            },
+            managers=[
+                ("species", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="detection",
+            name="species",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="detections",
+                to="web.species",
+            ),
+        ),
+        migrations.AddField(
+            model_name="detection",
+            name="interval_start",
+            field=models.FloatField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="detection",
+            name="interval_end",
+            field=models.FloatField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="dailyspeciessummary",
+            name="species",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="summaries",
+                to="web.species",
+            ),
+        ),
+        migrations.RunPython(normalize_detections, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("web", "0009_species"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="dailyspeciessummary",
+            name="unique_daily_species_summary",
+        ),
+        migrations.RemoveIndex(
+            model_name="dailyspeciessummary",
+            name="summary_species_count_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="detection",
+            name="detection_start_species_idx",
+        ),
+        migrations.RemoveField(
+            model_name="dailyspeciessummary",
+            name="common_name",
+        ),
+        migrations.RemoveField(
+            model_name="dailyspeciessummary",
+            name="scientific_name",
+        ),
+        migrations.RemoveField(
+            model_name="detection",
+            name="common_name",
+        ),
+        migrations.RemoveField(
+            model_name="detection",
+            name="interval",
+        ),
+        migrations.RemoveField(
+            model_name="detection",
+            name="scientific_name",
+        ),
+        migrations.AlterField(
+            model_name="dailyspeciessummary",
+            name="species",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="summaries",
+                to="web.species",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="detection",
+            name="species",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="detections",
+                to="web.species",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailyspeciessummary",
+            constraint=models.UniqueConstraint(
+                fields=("date", "species"), name="unique_daily_species_summary"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dailyspeciessummary",
+            index=models.Index(
+                fields=["species", "sample_count"], name="summary_species_count_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="detection",
+            index=models.Index(
+                fields=["recording_start", "species"],
+                name="detection_start_species_idx",
+            ),
+        ),
+    ]
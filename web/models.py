@@ -1,15 +1,60 @@
-from typing import Dict, List
+import functools
+import os
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Set, Tuple
 from dateutil.tz import tzlocal
 
-import arrow
-from django.db import models
-from django.db.models import Avg, Count, Max
-from django.db.models.functions import TruncDate
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Q, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .utils import humanize_since
+
+
+def read_config_version() -> str:
+    try:
+        return settings.CONFIG_VERSION_FILE.read_text()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_config_version():
+    path: Path = settings.CONFIG_VERSION_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(uuid.uuid4().hex)
+    tmp.replace(path)
 
 
 class ConfigManager(models.Manager):
+    """
+    Keeps the single Config row cached in the process. The cache is dropped
+    when the Config is saved, and other processes notice through the shared
+    version stamp, so lookups cost a small file read instead of a query.
+    """
+
+    _cache: Tuple[str, "Config"] | None = None
+
     def get_config(self):
+        version = read_config_version()
+        cache = self._cache
+        if cache is not None and cache[0] == version:
+            return cache[1]
+
+        config = self.fetch_config()
+        self._cache = (version, config)
+        return config
+
+    def invalidate(self):
+        self._cache = None
+
+    def fetch_config(self):
         config, _ = models.QuerySet["Config"](self.model, using=self._db).get_or_create(
             id=1,
             defaults={
@@ -33,28 +78,104 @@ class Config(models.Model):
     config = ConfigManager()
 
 
+def parse_interval(value: str) -> Tuple[float, float]:
+    """
+    Parse a `<start>,<end>` interval of offsets in seconds.
+    """
+    start, end = value.split(",")
+    return float(start), float(end)
+
+
+class SpeciesManager(models.Manager):
+    """
+    Maps scientific names to species ids, cached in the process. Species are
+    never renumbered, so a cached id stays valid; ids are only cached once the
+    transaction that read or created them has committed.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._ids: Dict[str, int] = {}
+        self._species: Dict[int, "Species"] = {}
+
+    def invalidate(self):
+        self._ids = {}
+        self._species = {}
+
+    def get_cached(self, ids: Set[int]) -> Dict[int, "Species"]:
+        """
+        Species by id, cached in the process once read from committed rows.
+        """
+        cached = {pk: self._species[pk] for pk in ids if pk in self._species}
+        missing = ids - cached.keys()
+        if missing:
+            found = self.in_bulk(missing)
+            cached.update(found)
+            transaction.on_commit(lambda: self._species.update(found), using=self.db)
+        return cached
+
+    def get_ids(self, names: Dict[str, str]) -> Dict[str, int]:
+        """
+        Ids of the species in `names`, a scientific to common name map,
+        creating the species not stored yet.
+        """
+        ids = {name: self._ids[name] for name in names if name in self._ids}
+        missing = [name for name in names if name not in ids]
+        if missing:
+            self.bulk_create(
+                [self.model(scientific_name=n, common_name=names[n]) for n in missing],
+                ignore_conflicts=True,
+            )
+            found = dict(
+                self.filter(scientific_name__in=missing).values_list(
+                    "scientific_name", "id"
+                )
+            )
+            ids.update(found)
+            transaction.on_commit(lambda: self._ids.update(found), using=self.db)
+        return ids
+
+
+class Species(models.Model):
+    scientific_name = models.CharField(max_length=200, unique=True)
+    common_name = models.CharField(max_length=200)
+
+    species = SpeciesManager()
+
+    class Meta:
+        verbose_name_plural = "species"
+
+    @functools.cached_property
+    def display(self) -> Dict[str, str]:
+        """
+        Names and guide link shown for this species on the detections pages.
+        """
+        name_slug = self.common_name.replace("'", "").replace(" ", "_")
+        return {
+            "scientific_name": self.scientific_name,
+            "common_name": self.common_name,
+            "link": f"https://www.allaboutbirds.org/guide/{name_slug}",
+        }
+
+
 class DetectionQuerySet(models.QuerySet["Detection"]):
-    def get_valid(self, config: Config):
+    def get_daily_totals(self):
+        """
+        Aggregate detections per local date and species, in the shape stored by
+        `DailySpeciesSummary`.
+        """
         timezone.activate(tzlocal())
 
         return (
             self.annotate(date=TruncDate("recording_start"))
-            .values("scientific_name", "common_name", "date")
+            .values("date", "species_id")
             .annotate(
-                sample_count=Count("scientific_name"),
-                audio_confidence=Avg("audio_confidence"),
+                sample_count=Count("id"),
+                audio_confidence_sum=Sum("audio_confidence"),
                 location_confidence=Max("location_confidence"),
                 last_detected_at=Max("recording_start"),
             )
-            .filter(sample_count__gte=config.min_sample_threshold)
-            .order_by("-last_detected_at")
-        )
-
-    def get_discovered(self, config: Config):
-        return (
-            self.values("scientific_name")
-            .annotate(count=Count("scientific_name"))
-            .filter(count__gte=config.min_sample_threshold)
+            .order_by()
         )
 
 
@@ -62,35 +183,361 @@ class DetectionManager(models.Manager):
     def get_queryset(self):
         return DetectionQuerySet(self.model, using=self._db)
 
-    def get_valid(self, config: "Config"):
-        results = self.get_queryset().get_valid(config)
-        detections: Dict[str, List] = {}
-        for row in results:
-            created_at = arrow.get(row.get("date", ""))
-            date = created_at.to("local").format("YYYY-MM-DD")
+    def from_payloads(self, items: List[dict]) -> List["Detection"]:
+        """
+        Build detections from API payloads, looking up the species ids of their
+        names and parsing their `<start>,<end>` intervals. Every payload is read
+        before any species is created, so a rejected batch leaves none behind.
+        """
+        names = {}
+        fields = []
+        for item in items:
+            names[item["scientific_name"]] = item["common_name"]
+            interval_start, interval_end = parse_interval(item["interval"])
+            fields.append(
+                {
+                    "recording_start": item["recording_start"],
+                    "recording_end": item["recording_end"],
+                    "interval_start": interval_start,
+                    "interval_end": interval_end,
+                    "audio_confidence": item["audio_confidence"],
+                    "location_confidence": item["location_confidence"],
+                    "location": item["location"],
+                }
+            )
+        ids = Species.species.get_ids(names)
+        return [
+            self.model(species_id=ids[item["scientific_name"]], **f)
+            for item, f in zip(items, fields)
+        ]
+
+    def create_batch(self, detections: List["Detection"]):
+        """
+        Insert detections and fold them into the daily species rollup in the
+        same transaction.
+        """
+        with transaction.atomic(using=self.db):
+            created = self.bulk_create(detections)
+            DailySpeciesSummary.summaries.add_detections(created)
+        return created
 
-            if detections.get(date) is None:
-                detections[date] = []
+    def create_new(
+        self, detections: List["Detection"]
+    ) -> Tuple[List["Detection"], int]:
+        """
+        Insert the detections that are not stored yet, matched on recording
+        start, interval and species, so a retried upload is not counted twice.
+        Returns the created detections and the number of duplicates skipped.
+        """
+        with transaction.atomic(using=self.db):
+            seen = set(
+                self.filter(
+                    recording_start__in={d.recording_start for d in detections}
+                ).values_list(
+                    "recording_start", "interval_start", "interval_end", "species_id"
+                )
+            )
+            new = []
+            for detection in detections:
+                key = (
+                    detection.recording_start,
+                    detection.interval_start,
+                    detection.interval_end,
+                    detection.species_id,
+                )
+                if key not in seen:
+                    seen.add(key)
+                    new.append(detection)
+            return self.create_batch(new), len(detections) - len(new)
+
+    def get_valid(
+        self,
+        config: "Config",
+        since: date | None = None,
+        until: date | None = None,
+        before: Tuple[datetime, int] | None = None,
+        limit: int | None = None,
+    ):
+        results = DailySpeciesSummary.summaries.get_valid(
+            config, since=since, until=until, before=before
+        )
+        if limit is not None:
+            results = results[:limit]
 
-            name_slug = row.get("common_name", "").replace("'", "").replace(" ", "_")
-            row["link"] = f"https://www.allaboutbirds.org/guide/{name_slug}"
+        # Names are looked up separately so the page query walks the
+        # last_detected_at index instead of starting from the species table
+        rows = list(results)
+        species = Species.species.get_cached({row["species_id"] for row in rows})
 
-            detections[date].append(row)
+        # Rows are handed to the template ready to print, relative times all
+        # measured from the same moment
+        now = timezone.now()
+        detections: Dict[str, List] = {}
+        for row in rows:
+            row.update(species[row["species_id"]].display)
+            last_detected_at = row["last_detected_at"]
+            row["last_detected"] = humanize_since(last_detected_at, now)
+            row["last_detected_title"] = last_detected_at.astimezone().strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+            # Summary dates are already local dates
+            detections.setdefault(row["date"].isoformat(), []).append(row)
         return detections
 
     def get_discovered(self, config: "Config"):
-        return self.get_queryset().get_discovered(config)
+        return DailySpeciesSummary.summaries.get_discovered(config)
+
+    def get_daily_totals(self):
+        return self.get_queryset().get_daily_totals()
+
+    def get_oldest_date(self) -> date | None:
+        """
+        Local date of the oldest detection still stored.
+        """
+        oldest = (
+            self.order_by("recording_start")
+            .values_list("recording_start", flat=True)
+            .first()
+        )
+        if oldest is None:
+            return None
+        return oldest.astimezone(tzlocal()).date()
+
+    def purge(self, before: datetime, chunk_size: int = 2000) -> Iterator[int]:
+        """
+        Delete detections recorded before `before`, oldest first, in chunks of
+        `chunk_size`. Every chunk is its own short transaction so other writers
+        get the database in between. Yields the number deleted per chunk.
+        """
+        while True:
+            with transaction.atomic(using=self.db):
+                ids = list(
+                    self.filter(recording_start__lt=before)
+                    .order_by("recording_start")
+                    .values_list("id", flat=True)[:chunk_size]
+                )
+                if not ids:
+                    return
+                self.filter(id__in=ids).delete()
+            yield len(ids)
 
 
 class Detection(models.Model):
     recording_start = models.DateTimeField()
     recording_end = models.DateTimeField()
-    interval = models.CharField(max_length=50)
-    scientific_name = models.CharField(max_length=200)
-    common_name = models.CharField(max_length=200)
+    # Offsets in seconds from recording_start
+    interval_start = models.FloatField()
+    interval_end = models.FloatField()
+    # Covered by detection_start_species_idx for the queries that matter, a
+    # separate index would only slow down inserts
+    species = models.ForeignKey(
+        Species, on_delete=models.PROTECT, related_name="detections", db_index=False
+    )
     audio_confidence = models.FloatField()
     location_confidence = models.FloatField()
     location = models.CharField(null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     detections = DetectionManager()
+
+    class Meta:
+        indexes = [
+            # Date range scans, e.g. rebuilding the rollup since a date
+            models.Index(
+                fields=["recording_start", "species"],
+                name="detection_start_species_idx",
+            ),
+        ]
+
+
+class DailySpeciesSummaryQuerySet(models.QuerySet["DailySpeciesSummary"]):
+    def get_valid(
+        self,
+        config: Config,
+        since: date | None = None,
+        until: date | None = None,
+        before: Tuple[datetime, int] | None = None,
+    ):
+        """
+        Species per day, newest first. `since` and `until` bound the dates and
+        `before` is a keyset cursor of the (last_detected_at, id) of the last
+        row already shown.
+        """
+        queryset = self.filter(sample_count__gte=config.min_sample_threshold)
+        # A summary's last detection falls on its local date, so the date range
+        # is repeated on last_detected_at to bound the index scan
+        if since is not None:
+            queryset = queryset.filter(
+                date__gte=since,
+                last_detected_at__gte=datetime.combine(
+                    since, time.min, tzinfo=tzlocal()
+                ),
+            )
+        if until is not None:
+            end = datetime.combine(
+                until + timedelta(days=1), time.min, tzinfo=tzlocal()
+            )
+            queryset = queryset.filter(date__lte=until, last_detected_at__lt=end)
+        if before is not None:
+            last_detected_at, pk = before
+            queryset = queryset.filter(
+                Q(last_detected_at__lt=last_detected_at)
+                | Q(last_detected_at=last_detected_at, id__lt=pk)
+            )
+
+        return (
+            queryset.annotate(
+                audio_confidence=F("audio_confidence_sum") / F("sample_count")
+            )
+            .values(
+                "id",
+                "date",
+                "sample_count",
+                "audio_confidence",
+                "location_confidence",
+                "last_detected_at",
+                "species_id",
+            )
+            .order_by("-last_detected_at", "-id")
+        )
+
+    def get_discovered(self, config: Config):
+        return (
+            self.values("species")
+            .annotate(count=Sum("sample_count"))
+            .filter(count__gte=config.min_sample_threshold)
+        )
+
+
+class DailySpeciesSummaryManager(models.Manager):
+    def get_queryset(self):
+        return DailySpeciesSummaryQuerySet(self.model, using=self._db)
+
+    def get_valid(self, config: Config, **kwargs):
+        return self.get_queryset().get_valid(config, **kwargs)
+
+    def get_discovered(self, config: Config):
+        return self.get_queryset().get_discovered(config)
+
+    def add_detections(self, detections: List[Detection]):
+        """
+        Fold newly inserted detections into the rollup. Each (date, species)
+        row is bumped with a single UPDATE, so concurrent writers never lose
+        counts, and created when it does not exist yet.
+        """
+        totals: Dict[tuple, dict] = defaultdict(
+            lambda: {
+                "sample_count": 0,
+                "audio_confidence_sum": 0.0,
+                "location_confidence": 0.0,
+                "last_detected_at": None,
+            }
+        )
+        for detection in detections:
+            recording_start = detection.recording_start
+            if isinstance(recording_start, str):
+                recording_start = parse_datetime(recording_start)
+            if timezone.is_naive(recording_start):
+                recording_start = timezone.make_aware(recording_start)
+
+            day = recording_start.astimezone(tzlocal()).date()
+            total = totals[(day, detection.species_id)]
+            total["sample_count"] += 1
+            total["audio_confidence_sum"] += detection.audio_confidence
+            total["location_confidence"] = max(
+                total["location_confidence"], detection.location_confidence
+            )
+            if (
+                total["last_detected_at"] is None
+                or recording_start > total["last_detected_at"]
+            ):
+                total["last_detected_at"] = recording_start
+
+        with transaction.atomic(using=self.db):
+            for (day, species_id), total in totals.items():
+                updated = self.filter(date=day, species_id=species_id).update(
+                    sample_count=F("sample_count") + total["sample_count"],
+                    audio_confidence_sum=F("audio_confidence_sum")
+                    + total["audio_confidence_sum"],
+                    location_confidence=Greatest(
+                        "location_confidence",
+                        Value(total["location_confidence"]),
+                    ),
+                    last_detected_at=Greatest(
+                        "last_detected_at",
+                        Value(
+                            total["last_detected_at"],
+                            output_field=models.DateTimeField(),
+                        ),
+                    ),
+                )
+                if not updated:
+                    self.create(date=day, species_id=species_id, **total)
+
+    def rebuild(self, since: date | None = None, until: date | None = None) -> int:
+        """
+        Recompute the rollup from the detections table, optionally only for
+        dates from `since` through `until`. Dates older than the oldest stored
+        detection were compacted by retention and are left as they are.
+        Returns the number of summary rows written.
+        """
+        oldest = Detection.detections.get_oldest_date()
+        if oldest is None:
+            return 0
+        since = oldest if since is None else max(since, oldest)
+
+        # Filter on the raw column so the range can use the index
+        start = datetime.combine(since, time.min, tzinfo=tzlocal())
+        totals = Detection.detections.get_daily_totals().filter(
+            recording_start__gte=start
+        )
+        summaries = self.filter(date__gte=since)
+        if until is not None:
+            end = datetime.combine(
+                until + timedelta(days=1), time.min, tzinfo=tzlocal()
+            )
+            totals = totals.filter(recording_start__lt=end)
+            summaries = summaries.filter(date__lte=until)
+
+        with transaction.atomic(using=self.db):
+            summaries.delete()
+            created = self.bulk_create(
+                (self.model(**row) for row in totals.iterator()), batch_size=1000
+            )
+        return len(created)
+
+
+class DailySpeciesSummary(models.Model):
+    """
+    Detections rolled up per local date and species, kept in step with the
+    detections table so pages never aggregate the raw detections.
+    """
+
+    date = models.DateField()
+    # Indexed by summary_species_count_idx
+    species = models.ForeignKey(
+        Species, on_delete=models.PROTECT, related_name="summaries", db_index=False
+    )
+    sample_count = models.PositiveIntegerField(default=0)
+    audio_confidence_sum = models.FloatField(default=0)
+    location_confidence = models.FloatField(default=0)
+    last_detected_at = models.DateTimeField()
+
+    summaries = DailySpeciesSummaryManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "species"],
+                name="unique_daily_species_summary",
+            )
+        ]
+        indexes = [
+            # get_valid: newest first without a sort step
+            models.Index(fields=["last_detected_at"], name="summary_last_detected_idx"),
+            # get_discovered: covers the GROUP BY and the summed count
+            models.Index(
+                fields=["species", "sample_count"],
+                name="summary_species_count_idx",
+            ),
+        ]
@@ -1,19 +1,198 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
 import arrow
 import requests
+from dateutil.tz import tzlocal
+from django.conf import settings
+from django.db import connection, transaction
+from loguru import logger
 
 from . import models
 
 
-def update_location(config: models.Config) -> models.Config:
-    session = requests.Session()
+class LocationService:
+    """
+    Resolves the node's location from its public IP address and stores it on
+    the Config.
+
+    Lookups run in a background thread so requests never wait on the external
+    services. A resolved location is reused for `ttl` seconds and a failed
+    lookup is not retried for `retry_after` seconds. Locations entered by hand
+    on the settings page are never replaced.
+    """
+
+    def __init__(
+        self,
+        ip_url: str,
+        geo_url: str,
+        ttl: float,
+        retry_after: float,
+        timeout: float = 5,
+    ):
+        self.ip_url = ip_url
+        self.geo_url = geo_url
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.timeout = timeout
+        self.failed_at: float | None = None
+        self._refreshing = threading.Lock()
+
+    def is_stale(self, config: models.Config) -> bool:
+        if config.location.get("source") == "manual":
+            return False
+
+        now = arrow.now().timestamp()
+        if self.failed_at is not None and now - self.failed_at < self.retry_after:
+            return False
+        return now - config.location.get("resolved_at", 0) >= self.ttl
+
+    def lookup(self, ip_address: str | None = None) -> dict:
+        """
+        Look up the public IP address and, unless it matches `ip_address`, its
+        location. Returns the ip-api style location.
+        """
+        session = requests.Session()
 
-    response = session.get("https://api.ipify.org", timeout=5)
-    ip_address = response.text
+        response = session.get(self.ip_url, timeout=self.timeout)
+        response.raise_for_status()
+        ip = response.text.strip()
+        if ip == ip_address:
+            return {"query": ip}
 
-    if ip_address != config.location.get("query", ""):
-        response = session.get(f"http://ip-api.com/json/{ip_address}", timeout=5)
+        response = session.get(self.geo_url.format(ip=ip), timeout=self.timeout)
+        response.raise_for_status()
         data = response.json()
-        config.location = data
-        config.save()
+        if data.get("status", "success") != "success":
+            raise ValueError(f"Location lookup for {ip} failed: {data}")
+        return data
+
+    def refresh(self, config: models.Config) -> models.Config:
+        """
+        Resolve the location now and save it on `config`. Failures are logged
+        and remembered so the lookup is not retried straight away.
+
+        The lookup takes a while, so only the location is written, to the row
+        as it is after the lookup, and not at all when a location was entered
+        by hand in the meantime.
+        """
+        try:
+            data = self.lookup(config.location.get("query"))
+        except (requests.RequestException, ValueError) as e:
+            self.failed_at = arrow.now().timestamp()
+            logger.warning(f"Location lookup failed, retrying later: {e}")
+            return config
+
+        self.failed_at = None
+        with transaction.atomic():
+            current = models.Config.config.get(pk=config.pk)
+            if current.location.get("source") != "manual":
+                current.location = {
+                    **current.location,
+                    **data,
+                    "resolved_at": arrow.now().timestamp(),
+                }
+                current.save(update_fields=["location", "updated_at"])
+        config.location = current.location
+        return config
+
+    def refresh_in_background(self, config: models.Config):
+        """
+        Start a refresh when the location is stale and none is running yet.
+        """
+        if not self.is_stale(config) or not self._refreshing.acquire(blocking=False):
+            return
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.refresh(models.Config.config.fetch_config())
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.exception(e)
+        finally:
+            connection.close()
+            self._refreshing.release()
+
+
+class RetentionService:
+    """
+    Compacts detections older than `days` into the daily species rollup and
+    deletes them, one local day at a time.
+
+    `create_batch` keeps the rollup current as detections arrive, so days are
+    only rebuilt from the raw detections when they have no summaries at all. A
+    day that already has them may hold compacted counts from an earlier run,
+    e.g. when a late detection arrives for it, and recounting its remaining raw
+    detections would lose them. Deletes run in small chunks with a `pause` in
+    between, so the web app and the analyzer are never locked out for long, and
+    freed pages are handed back to the filesystem every `vacuum_every` chunks.
+    """
+
+    def __init__(
+        self,
+        days: int,
+        chunk_size: int = 2000,
+        pause: float = 0.05,
+        vacuum_every: int = 10,
+        vacuum_pages: int = 2000,
+    ):
+        self.days = days
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.vacuum_every = vacuum_every
+        self.vacuum_pages = vacuum_pages
+
+    def cutoff(self):
+        """
+        First local date whose raw detections are kept.
+        """
+        return arrow.now().date() - timedelta(days=self.days - 1)
+
+    def run(self) -> dict:
+        """
+        Compact and delete every day before the cutoff. Returns the number of
+        days compacted and detections deleted.
+        """
+        cutoff = self.cutoff()
+        stats = {"days": 0, "deleted": 0}
+        chunks = 0
+
+        while (day := models.Detection.detections.get_oldest_date()) is not None:
+            if day >= cutoff:
+                break
+
+            if not models.DailySpeciesSummary.summaries.filter(date=day).exists():
+                models.DailySpeciesSummary.summaries.rebuild(since=day, until=day)
+            end = datetime.combine(day + timedelta(days=1), datetime.min.time())
+            for deleted in models.Detection.detections.purge(
+                end.replace(tzinfo=tzlocal()), self.chunk_size
+            ):
+                stats["deleted"] += deleted
+                chunks += 1
+                if chunks % self.vacuum_every == 0:
+                    self.vacuum()
+                time.sleep(self.pause)
+
+            stats["days"] += 1
+            logger.info(f"Compacted detections for {day}")
+
+        self.vacuum()
+        return stats
+
+    def vacuum(self):
+        """
+        Release up to `vacuum_pages` free pages. A no-op unless the database
+        uses incremental auto-vacuum.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages})")
+            cursor.fetchall()
+
 
-    return config
+location_service = LocationService(
+    ip_url=settings.LOCATION_IP_URL,
+    geo_url=settings.LOCATION_GEO_URL,
+    ttl=settings.LOCATION_TTL,
+    retry_after=settings.LOCATION_RETRY_AFTER,
+)
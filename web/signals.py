@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from . import models
+
+
+@receiver(post_save, sender=models.Config)
+@receiver(post_delete, sender=models.Config)
+def invalidate_config(sender, **kwargs):
+    """
+    Drop this process's cached Config right away, and tell other processes
+    once the change is committed so they cannot re-cache the old row.
+    """
+    models.Config.config.invalidate()
+    transaction.on_commit(models.bump_config_version)
+
+
+@receiver(post_delete, sender=models.Species)
+@receiver(post_migrate)
+def invalidate_species(sender, **kwargs):
+    """
+    Drop cached species ids once rows may have gone, e.g. when the database is
+    flushed.
+    """
+    models.Species.species.invalidate()
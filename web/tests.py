@@ -1,3 +1,775 @@
-from django.test import TestCase
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import arrow
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from . import events, metrics, models, services, views
+from .utils import humanize_since
+
+
+class QueryPlanTests(TestCase):
+    """
+    Seeds a large synthetic detections table and checks that the listing
+    queries keep using their indexes. Query timings are printed so slowdowns
+    show up in the test output.
+    """
+
+    DETECTIONS = 50_000
+    SPECIES = 200
+    DAYS = 120
+
+    timings: dict[str, float] = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        now = datetime.now(timezone.utc)
+        species = list(
+            models.Species.species.get_ids(
+                {f"Genus species{i}": f"Bird {i}" for i in range(cls.SPECIES)}
+            ).values()
+        )
+
+        detections = []
+        for _ in range(cls.DETECTIONS):
+            start = now - timedelta(seconds=rng.randrange(cls.DAYS * 86400))
+            detections.append(
+                models.Detection(
+                    recording_start=start,
+                    recording_end=start + timedelta(seconds=12),
+                    interval_start=0.0,
+                    interval_end=3.0,
+                    species_id=rng.choice(species),
+                    audio_confidence=rng.random(),
+                    location_confidence=rng.random(),
+                )
+            )
+        models.Detection.detections.bulk_create(detections, batch_size=5000)
+        models.DailySpeciesSummary.summaries.rebuild()
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        cls.config = models.Config.config.get_config()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for name, seconds in cls.timings.items():
+            print(f"\n{name}: {seconds * 1000:.2f} ms", end="", file=sys.stderr)
+
+    def time_query(self, name, queryset):
+        start = time.perf_counter()
+        list(queryset)
+        self.timings[name] = time.perf_counter() - start
+
+    def test_get_valid_uses_index(self):
+        queryset = models.DailySpeciesSummary.summaries.get_valid(self.config)
+        plan = queryset.explain()
+
+        self.assertIn("summary_last_detected_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        self.time_query("get_valid", queryset)
+
+    def test_get_valid_page_uses_index(self):
+        newest = models.DailySpeciesSummary.summaries.get_valid(self.config)[100]
+        queryset = models.DailySpeciesSummary.summaries.get_valid(
+            self.config,
+            until=date.today() - timedelta(days=7),
+            before=(newest["last_detected_at"], newest["id"]),
+        )[:50]
+        plan = queryset.explain()
+
+        self.assertIn("summary_last_detected_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        self.time_query("get_valid (keyset page)", queryset)
+
+    def test_get_discovered_uses_covering_index(self):
+        queryset = models.DailySpeciesSummary.summaries.get_discovered(self.config)
+        plan = queryset.explain()
+
+        self.assertIn("COVERING INDEX summary_species_count_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        self.time_query("get_discovered", queryset)
+
+    def test_rebuild_since_uses_index(self):
+        since = date.today() - timedelta(days=7)
+        start = datetime.combine(since, datetime.min.time(), tzinfo=timezone.utc)
+        queryset = models.Detection.detections.get_daily_totals().filter(
+            recording_start__gte=start
+        )
+        plan = queryset.explain()
+
+        self.assertIn("detection_start_species_idx", plan)
+        self.assertNotIn("SCAN web_detection", plan)
+        self.time_query("get_daily_totals (7 days)", queryset)
+
+    def test_rollup_matches_detections(self):
+        summaries = models.DailySpeciesSummary.summaries.aggregate(
+            total=Sum("sample_count")
+        )
+        self.assertEqual(summaries["total"], self.DETECTIONS)
+        self.time_query(
+            "get_daily_totals (all)", models.Detection.detections.get_daily_totals()
+        )
+
+
+class TagBalance(HTMLParser):
+    """
+    Collects elements that are closed without being open, or never closed.
+    """
+
+    VOID = {"area", "base", "br", "col", "hr", "img", "input", "link", "meta", "source"}
+
+    def __init__(self):
+        super().__init__()
+        self.open: list[str] = []
+        self.unbalanced: list[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in self.VOID:
+            self.open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def handle_endtag(self, tag):
+        if self.open and self.open[-1] == tag:
+            self.open.pop()
+        else:
+            self.unbalanced.append(f"</{tag}>")
+
+
+class HomePageTests(TestCase):
+    def test_renders_balanced_markup(self):
+        now = datetime.now(timezone.utc)
+        models.Detection.detections.create_batch(
+            models.Detection.detections.from_payloads(
+                [
+                    {
+                        "recording_start": now,
+                        "recording_end": now + timedelta(seconds=12),
+                        "interval": f"{i * 3.0},{i * 3.0 + 3.0}",
+                        "scientific_name": "Turdus migratorius",
+                        "common_name": "American Robin",
+                        "audio_confidence": 0.9,
+                        "location_confidence": 0.5,
+                        "location": None,
+                    }
+                    for i in range(4)
+                ]
+            )
+        )
+
+        response = self.client.get("/")
+
+        self.assertContains(response, "American Robin")
+        parser = TagBalance()
+        parser.feed(response.content.decode())
+        parser.close()
+        self.assertEqual(parser.unbalanced, [])
+        self.assertEqual(parser.open, [])
+
+
+class DetectionsViewTests(TestCase):
+    def setUp(self):
+        # The current minute is part of the ETag
+        patcher = mock.patch("web.views.arrow.now", return_value=arrow.now())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        models.Config.config.invalidate()
+
+    def add_detection(self, minutes: int):
+        start = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+        models.Detection.detections.create_batch(
+            models.Detection.detections.from_payloads(
+                [
+                    {
+                        "recording_start": start,
+                        "recording_end": start + timedelta(seconds=12),
+                        "interval": "0.0,3.0",
+                        "scientific_name": "Turdus migratorius",
+                        "common_name": "American Robin",
+                        "audio_confidence": 0.9,
+                        "location_confidence": 0.5,
+                        "location": None,
+                    }
+                ]
+            )
+        )
+
+    def assertRevalidates(self, etag: str) -> str:
+        """
+        Check `etag` is stale and return the new one.
+        """
+        response = self.client.get("/views/detections", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        return response["ETag"]
+
+    def test_unchanged_detections_answer_304(self):
+        self.add_detection(10)
+        response = self.client.get("/views/detections")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        response = self.client.get("/views/detections", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.add_detection(5)
+        etag = self.assertRevalidates(etag)
+
+        config = models.Config.config.get_config()
+        config.min_audio_confidence = 50
+        config.save()
+        self.assertRevalidates(etag)
+
+
+class ConfigCacheTests(TestCase):
+    def setUp(self):
+        models.Config.config.invalidate()
+
+    def test_cached_config_costs_no_queries(self):
+        models.Config.config.get_config()
+
+        with self.assertNumQueries(0):
+            models.Config.config.get_config()
+
+    def test_cached_species_ids_cost_no_queries(self):
+        names = {"Turdus migratorius": "American Robin"}
+        # The ids are rolled back with the test, don't leave them cached
+        self.addCleanup(models.Species.species.invalidate)
+        with self.captureOnCommitCallbacks(execute=True):
+            ids = models.Species.species.get_ids(names)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(models.Species.species.get_ids(names), ids)
+
+    def test_change_from_another_process_is_read_after_version_bump(self):
+        config = models.Config.config.get_config()
+        # Another process saves the Config: the row changes without this
+        # process's signals running, then the shared version is bumped
+        models.Config.config.filter(pk=config.pk).update(min_audio_confidence=42)
+        self.assertEqual(models.Config.config.get_config().min_audio_confidence, 70)
+
+        models.bump_config_version()
+
+        self.assertEqual(models.Config.config.get_config().min_audio_confidence, 42)
+
+    def test_version_stamp_is_written_outside_the_checkout(self):
+        self.assertFalse(settings.CONFIG_VERSION_FILE.is_relative_to(settings.BASE_DIR))
+
+
+class HumanizeSinceTests(SimpleTestCase):
+    def test_matches_arrow(self):
+        now = datetime.now(timezone.utc)
+        for seconds in [*range(0, 200), *range(200, 30 * 86400, 997)]:
+            value = now - timedelta(seconds=seconds + 0.5)
+            self.assertEqual(
+                humanize_since(value, now), arrow.get(value).humanize(now), seconds
+            )
+
+
+class EventStreamTests(TestCase):
+    """
+    Opens many event streams through the async test client, which serves them
+    like an ASGI server would, and checks every subscriber gets each event.
+    """
+
+    SUBSCRIBERS = 50
+
+    async def read_event(self, stream) -> str:
+        return (await asyncio.wait_for(anext(stream), timeout=5)).decode()
+
+    async def disconnect(self, streams):
+        # The ASGI handler cancels the streaming task when a browser disconnects
+        pending = [asyncio.ensure_future(anext(stream)) for stream in streams]
+        await asyncio.sleep(0)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def test_detections_fan_out_to_all_subscribers(self):
+        responses = await asyncio.gather(
+            *(self.async_client.get("/events") for _ in range(self.SUBSCRIBERS))
+        )
+        streams = [aiter(response.streaming_content) for response in responses]
+        for response, stream in zip(responses, streams):
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            self.assertEqual(await self.read_event(stream), ": connected\n\n")
+        self.assertEqual(len(events.broker), self.SUBSCRIBERS)
+
+        start = datetime.now(timezone.utc)
+        detection = {
+            "recording_start": start.isoformat(),
+            "recording_end": (start + timedelta(seconds=12)).isoformat(),
+            "interval": "0.0,3.0",
+            "scientific_name": "Turdus migratorius",
+            "common_name": "American Robin",
+            "audio_confidence": 0.9,
+            "location_confidence": 0.5,
+            "location": None,
+        }
+        response = await self.async_client.post(
+            "/api/detections",
+            json.dumps([detection, detection]),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 204)
+
+        received = await asyncio.gather(
+            *(self.read_event(stream) for stream in streams)
+        )
+        for message in received:
+            event, data = message.strip().split("\n")
+            self.assertEqual(event, "event: detections")
+            self.assertEqual(
+                json.loads(data.removeprefix("data: ")),
+                {"count": 2, "species": ["American Robin"]},
+            )
+
+        await self.disconnect(streams)
+        self.assertEqual(len(events.broker), 0)
+
+    async def test_heartbeat_publishes_health_change(self):
+        response = await self.async_client.get("/events")
+        stream = aiter(response.streaming_content)
+        await self.read_event(stream)
+
+        await self.async_client.get("/heartbeat/recorder", {"spool_depth": 7})
+
+        message = await self.read_event(stream)
+        self.assertTrue(message.startswith("event: health\n"))
+        self.assertEqual(json.loads(message.split("data: ")[1])["spool_depth"], 7)
+        await self.disconnect([stream])
+
+
+class RetentionTests(TestCase):
+    DAYS = 40
+    RETENTION_DAYS = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        today = datetime.now().astimezone()
+        detections = []
+        for day in range(cls.DAYS):
+            noon = today.replace(hour=12) - timedelta(days=day)
+            for i in range(day % 4 + 1):
+                detections.append(
+                    {
+                        "recording_start": noon + timedelta(minutes=i),
+                        "recording_end": noon + timedelta(minutes=i, seconds=12),
+                        "interval": "0.0,3.0",
+                        "scientific_name": f"Genus species{i}",
+                        "common_name": f"Bird {i}",
+                        "audio_confidence": 0.5 + i / 10,
+                        "location_confidence": 0.5,
+                        "location": None,
+                    }
+                )
+        models.Detection.detections.create_batch(
+            models.Detection.detections.from_payloads(detections)
+        )
+        cls.config = models.Config.config.get_config()
+
+    def snapshot(self):
+        return (
+            list(models.DailySpeciesSummary.summaries.get_valid(self.config)),
+            list(models.Detection.detections.get_discovered(self.config)),
+        )
+
+    def test_compacts_old_detections_into_rollup(self):
+        before = self.snapshot()
+        service = services.RetentionService(
+            self.RETENTION_DAYS, chunk_size=3, pause=0, vacuum_every=2
+        )
+
+        stats = service.run()
+
+        self.assertEqual(stats["days"], self.DAYS - self.RETENTION_DAYS)
+        self.assertEqual(
+            models.Detection.detections.get_oldest_date(), service.cutoff()
+        )
+        self.assertEqual(self.snapshot(), before)
+
+        # Rebuilding only recomputes the days raw detections are kept for
+        models.DailySpeciesSummary.summaries.rebuild()
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(service.run()["deleted"], 0)
+
+    def test_late_detection_for_compacted_day_keeps_its_counts(self):
+        service = services.RetentionService(self.RETENTION_DAYS, pause=0)
+        service.run()
+        day = service.cutoff() - timedelta(days=1)
+        summary = models.DailySpeciesSummary.summaries.filter(date=day).first()
+        count = summary.sample_count
+
+        noon = datetime.combine(day, datetime.min.time()).astimezone().replace(hour=12)
+        late = noon + timedelta(minutes=30)
+        models.Detection.detections.create_batch(
+            models.Detection.detections.from_payloads(
+                [
+                    {
+                        "recording_start": late,
+                        "recording_end": late + timedelta(seconds=12),
+                        "interval": "0.0,3.0",
+                        "scientific_name": summary.species.scientific_name,
+                        "common_name": summary.species.common_name,
+                        "audio_confidence": 0.9,
+                        "location_confidence": 0.5,
+                        "location": None,
+                    }
+                ]
+            )
+        )
+        summary.refresh_from_db()
+        self.assertEqual(summary.sample_count, count + 1)
+
+        self.assertEqual(service.run()["deleted"], 1)
+
+        summary = models.DailySpeciesSummary.summaries.get(
+            date=day, species=summary.species
+        )
+        self.assertEqual(summary.sample_count, count + 1)
+
+
+class DetectionsApiTests(TestCase):
+    def test_rejected_batch_creates_no_species(self):
+        start = datetime(2025, 6, 1, 12, tzinfo=timezone.utc)
+        detection = {
+            "recording_start": start.isoformat(),
+            "recording_end": (start + timedelta(seconds=12)).isoformat(),
+            "interval": "0.0,3.0",
+            "scientific_name": "Turdus migratorius",
+            "common_name": "American Robin",
+            "audio_confidence": 0.9,
+            "location_confidence": 0.5,
+            "location": None,
+        }
+        response = self.client.post(
+            "/api/detections",
+            [
+                detection,
+                {
+                    **detection,
+                    "interval": "3.0",
+                    "scientific_name": "Cyanocitta cristata",
+                    "common_name": "Blue Jay",
+                },
+            ],
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.Species.species.exists())
+        self.assertFalse(models.Detection.detections.exists())
+
+
+class BulkIngestTests(TestCase):
+    def detection(self, i: int) -> dict:
+        start = datetime(2025, 6, 1, 12, tzinfo=timezone.utc) + timedelta(minutes=i)
+        return {
+            "recording_start": start.isoformat(),
+            "recording_end": (start + timedelta(seconds=12)).isoformat(),
+            "interval": "0.0,3.0",
+            "scientific_name": "Turdus migratorius",
+            "common_name": "American Robin",
+            "audio_confidence": 0.9,
+            "location_confidence": 0.5,
+            "location": None,
+        }
+
+    def post(self, lines: list) -> dict:
+        response = self.client.post(
+            "/api/detections/bulk",
+            "\n".join(
+                line if isinstance(line, str) else json.dumps(line) for line in lines
+            ),
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    @mock.patch("web.views.INGEST_BATCH_SIZE", 2)
+    def test_reports_invalid_lines_and_stores_the_rest(self):
+        report = self.post(
+            [
+                self.detection(0),
+                "{not json",
+                {**self.detection(1), "audio_confidence": 2},
+                self.detection(2),
+                self.detection(3),
+            ]
+        )
+
+        self.assertEqual(report["created"], 3)
+        self.assertEqual(report["error_count"], 2)
+        self.assertEqual([error["line"] for error in report["errors"]], [2, 3])
+        self.assertIn("audio_confidence", report["errors"][1]["errors"])
+        self.assertEqual(models.Detection.detections.count(), 3)
+
+    def test_retried_upload_is_not_stored_twice(self):
+        lines = [self.detection(i) for i in range(3)]
+        self.post(lines)
+
+        report = self.post(lines + [self.detection(3)])
+
+        self.assertEqual((report["created"], report["duplicates"]), (1, 3))
+        summary = models.DailySpeciesSummary.summaries.get()
+        self.assertEqual(summary.sample_count, 4)
+
+    def test_columnar_rows(self):
+        columns = list(self.detection(0))
+        report = self.post(
+            [
+                {"columns": columns},
+                list(self.detection(0).values()),
+                list(self.detection(1).values())[:-1],
+            ]
+        )
+
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(report["errors"][0]["line"], 3)
+
+
+class MetricsTests(TestCase):
+    def ingested(self) -> float:
+        # Metrics are kept for the whole process, across tests
+        values = dict(
+            (tuple(key), value) for key, value in views.INGEST_ROWS.snapshot()["values"]
+        )
+        return values.get(("detections",), [0])[0]
+
+    def test_histogram_survives_a_snapshot_round_trip(self):
+        registry = metrics.Registry()
+        histogram = metrics.Histogram(
+            "test_seconds", "Test", ["stage"], buckets=(0.1, 1), registry=registry
+        )
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, stage="decode")
+
+        merged = metrics.Registry()
+        merged.merge(json.loads(json.dumps(registry.snapshot())))
+        merged.merge(registry.snapshot(reset=True))
+
+        lines = merged.render().splitlines()
+        self.assertIn('test_seconds_bucket{stage="decode",le="0.1"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="decode",le="+Inf"} 6', lines)
+        self.assertIn('test_seconds_count{stage="decode"} 6', lines)
+        self.assertNotIn("test_seconds_count", registry.render())
+
+    def test_spool_depth_is_reported_per_service(self):
+        self.client.get("/heartbeat/recorder", {"spool_depth": 3})
+        self.client.get("/heartbeat/analyzer", {"spool_depth": 4})
+
+        lines = self.client.get("/metrics").content.decode().splitlines()
+
+        self.assertIn('scout_spool_depth{service="recorder"} 3', lines)
+        self.assertIn('scout_spool_depth{service="analyzer"} 4', lines)
+
+    def test_endpoint_reports_ingest_and_analyzer_heartbeat(self):
+        registry = metrics.Registry()
+        metrics.Counter(
+            "scout_analyzer_recordings_total", "Recordings", registry=registry
+        ).inc(3)
+        self.client.get(
+            "/heartbeat/analyzer", {"metrics": json.dumps(registry.snapshot())}
+        )
+        before = self.ingested()
+        start = datetime(2025, 6, 1, 12, tzinfo=timezone.utc)
+        self.client.post(
+            "/api/detections",
+            [
+                {
+                    "recording_start": start.isoformat(),
+                    "recording_end": (start + timedelta(seconds=12)).isoformat(),
+                    "interval": "0.0,3.0",
+                    "scientific_name": "Turdus migratorius",
+                    "common_name": "American Robin",
+                    "audio_confidence": 0.9,
+                    "location_confidence": 0.5,
+                    "location": None,
+                }
+            ],
+            content_type="application/json",
+        )
+
+        response = self.client.get("/metrics")
+
+        lines = response.content.decode().splitlines()
+        self.assertIn("scout_analyzer_recordings_total 3", lines)
+        self.assertIn(
+            f'scout_ingest_rows_total{{endpoint="detections"}} {before + 1:g}', lines
+        )
+
+
+class LocationStandIn(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the public IP and geolocation services.
+    """
+
+    ip = "203.0.113.7"
+    delay = 0.0
+    fail = False
+    requests: list[str] = []
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.requests.append(self.path)
+        time.sleep(self.delay)
+        if self.fail:
+            self.send_error(503)
+            return
+
+        if self.path == "/ip":
+            body = self.ip.encode()
+        else:
+            body = json.dumps(
+                {
+                    "status": "success",
+                    "query": self.path.rsplit("/", 1)[-1],
+                    "city": "Philadelphia",
+                    "region": "PA",
+                    "lat": 39.95,
+                    "lon": -75.16,
+                }
+            ).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class LocationServiceMixin:
+    def setUp(self):
+        super().setUp()  # type: ignore[misc]
+        LocationStandIn.delay = 0.0
+        LocationStandIn.fail = False
+        LocationStandIn.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), LocationStandIn)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        url = f"http://127.0.0.1:{self.server.server_port}"
+        self.service = services.LocationService(
+            ip_url=f"{url}/ip",
+            geo_url=f"{url}/json/{{ip}}",
+            ttl=3600,
+            retry_after=60,
+            timeout=1,
+        )
+        models.Config.config.invalidate()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()  # type: ignore[misc]
+
+
+class LocationServiceTests(LocationServiceMixin, TestCase):
+    def test_refresh_resolves_and_caches_location(self):
+        config = models.Config.config.get_config()
+        self.assertTrue(self.service.is_stale(config))
+
+        self.service.refresh(config)
+
+        location = models.Config.config.get_config().location
+        self.assertEqual(location["city"], "Philadelphia")
+        self.assertEqual(location["query"], LocationStandIn.ip)
+        self.assertFalse(self.service.is_stale(config))
+        self.assertEqual(
+            LocationStandIn.requests, ["/ip", f"/json/{LocationStandIn.ip}"]
+        )
+
+    def test_unchanged_ip_skips_geolocation(self):
+        config = self.service.refresh(models.Config.config.get_config())
+        LocationStandIn.requests = []
+
+        self.service.refresh(config)
+
+        self.assertEqual(LocationStandIn.requests, ["/ip"])
+        self.assertEqual(config.location["city"], "Philadelphia")
+
+    def test_failed_lookup_is_not_retried_until_retry_after(self):
+        LocationStandIn.fail = True
+        config = models.Config.config.get_config()
+
+        self.service.refresh(config)
+
+        self.assertEqual(config.location, {})
+        self.assertFalse(self.service.is_stale(config))
+        assert self.service.failed_at is not None
+        self.service.failed_at -= 61
+        self.assertTrue(self.service.is_stale(config))
+
+    def refresh_while_saving(self, **changes):
+        """
+        Refresh the location while the settings page saves `changes`.
+        """
+        config = models.Config.config.get_config()
+        lookup = self.service.lookup
+
+        def lookup_and_save(ip_address):
+            data = lookup(ip_address)
+            saved = models.Config.config.get(pk=config.pk)
+            for field, value in changes.items():
+                setattr(saved, field, value)
+            saved.save()
+            return data
+
+        with mock.patch.object(self.service, "lookup", lookup_and_save):
+            self.service.refresh(config)
+        return models.Config.config.get(pk=config.pk)
+
+    def test_refresh_keeps_settings_saved_during_lookup(self):
+        config = self.refresh_while_saving(min_audio_confidence=42)
+
+        self.assertEqual(config.min_audio_confidence, 42)
+        self.assertEqual(config.location["city"], "Philadelphia")
+
+    def test_refresh_keeps_manual_location_saved_during_lookup(self):
+        manual = {"lat": 40.0, "lon": -75.0, "source": "manual"}
+
+        config = self.refresh_while_saving(location=manual)
+
+        self.assertEqual(config.location, manual)
+
+    def test_manual_location_is_never_refreshed(self):
+        config = models.Config.config.get_config()
+        config.location = {"lat": 40.0, "lon": -75.0, "source": "manual"}
+        config.save()
+
+        self.assertFalse(self.service.is_stale(config))
+
+
+class ConfigApiLocationTests(LocationServiceMixin, TransactionTestCase):
+    def test_config_api_does_not_wait_for_location(self):
+        LocationStandIn.delay = 0.5
+
+        with mock.patch.object(services, "location_service", self.service):
+            start = time.perf_counter()
+            response = self.client.get("/api/config")
+            elapsed = time.perf_counter() - start
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["location"], {})
+            self.assertLess(elapsed, LocationStandIn.delay)
+
+            # The refresh finished in the background and saved the location
+            with self.service._refreshing:  # pylint: disable=protected-access
+                pass
+            response = self.client.get("/api/config")
+            self.assertEqual(response.json()["location"]["city"], "Philadelphia")
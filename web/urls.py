@@ -6,11 +6,21 @@ urlpatterns = [
     # Views
     path("", views.HomeView.as_view(), name="home-view"),
     path("views/detections", views.DetectionsView.as_view(), name="detections-view"),
+    path(
+        "views/detections/older",
+        views.OlderDetectionsView.as_view(),
+        name="older-detections-view",
+    ),
     path("views/settings", views.SettingsView.as_view(), name="settings-view"),
     # API Routes
     path("healthcheck", views.HealthcheckView.as_view(), name="healthcheck"),
+    path("metrics", views.metrics_view, name="metrics"),
+    path("events", views.event_stream_view, name="events"),
     path("heartbeat/recorder", views.recorder_heartbeat),
+    path("heartbeat/analyzer", views.analyzer_heartbeat),
+    # Misspelled route still used by analyzers from before it was fixed
     path("heartbeat/analzyer", views.analyzer_heartbeat),
     path("api/config", views.get_config),
     path("api/detections", views.create_detections),
+    path("api/detections/bulk", views.bulk_create_detections),
 ]
@@ -1,39 +1,188 @@
+import asyncio
 import json
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
 
 import arrow
-from loguru import logger
-from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import condition
 from django.forms.models import model_to_dict
 from django.views.generic.base import TemplateView
 from django.shortcuts import redirect
-
-from . import models, forms, services
-
-
-class HomeView(TemplateView):
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+
+from . import events, metrics, models, forms, services
+
+
+# Days of history rendered up front, older days are loaded on scroll
+RECENT_DAYS = 7
+# Species rows per lazily loaded page of older detections
+PAGE_SIZE = 50
+# Detections inserted per transaction by the bulk ingest API, and the most
+# item errors reported back
+INGEST_BATCH_SIZE = 500
+MAX_INGEST_ERRORS = 100
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl")
+
+VIEW_SECONDS = metrics.Histogram(
+    "scout_view_seconds",
+    "Seconds the detection views spend querying and rendering",
+    ["view", "phase"],
+)
+INGEST_ROWS = metrics.Counter(
+    "scout_ingest_rows_total", "Detections stored through the API", ["endpoint"]
+)
+INGEST_BATCHES = metrics.Histogram(
+    "scout_ingest_batch_size",
+    "Detections per API request",
+    ["endpoint"],
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+INGEST_SECONDS = metrics.Histogram(
+    "scout_ingest_seconds", "Seconds spent storing an API request", ["endpoint"]
+)
+SERVICE_SPOOL_DEPTH = metrics.Gauge(
+    "scout_spool_depth", "Detections waiting in a service's spool", ["service"]
+)
+SERVICE_HEARTBEAT_AGE = metrics.Gauge(
+    "scout_heartbeat_age_seconds", "Seconds since a service's heartbeat", ["service"]
+)
+
+
+def parse_date(value: str | None, default: date) -> date:
+    try:
+        return date.fromisoformat(value or "")
+    except ValueError:
+        return default
+
+
+def parse_cursor(value: str | None) -> tuple[datetime, int] | None:
+    """
+    Parse a `<last_detected_at>,<id>` keyset cursor.
+    """
+    try:
+        last_detected_at, pk = (value or "").rsplit(",", 1)
+        return datetime.fromisoformat(last_detected_at), int(pk)
+    except ValueError:
+        return None
+
+
+def older_detections_url(until: date, detections: dict | None = None) -> str | None:
+    """
+    URL of the next page of older detections, continuing after the last row
+    of `detections` if given.
+    """
+    params = {"until": until.isoformat()}
+    if detections is not None:
+        if not detections:
+            return None
+        day, species = list(detections.items())[-1]
+        last = species[-1]
+        params["before"] = f"{last['last_detected_at'].isoformat()},{last['id']}"
+        params["day"] = day
+    return f"{reverse('older-detections-view')}?{urlencode(params)}"
+
+
+class TimedTemplateView(TemplateView):
+    """
+    Records the time spent building the context, where the queries run, and
+    rendering the template in VIEW_SECONDS.
+    """
+
+    def get(self, request, *args, **kwargs):
+        view = type(self).__name__
+        with VIEW_SECONDS.time(view=view, phase="query"):
+            context = self.get_context_data(**kwargs)
+        response = self.render_to_response(context)
+        with VIEW_SECONDS.time(view=view, phase="render"):
+            return response.render()
+
+
+class HomeView(TimedTemplateView):
     template_name = "index.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         config = models.Config.config.get_config()
-        detections = models.Detection.detections.get_valid(config)
+        today = arrow.now().date()
+        since = parse_date(
+            self.request.GET.get("since"), today - timedelta(days=RECENT_DAYS - 1)
+        )
+        detections = models.Detection.detections.get_valid(config, since=since)
         context["detections"] = detections
+        context["since"] = since
+        context["older_url"] = older_detections_url(since - timedelta(days=1))
         total_discovered = models.Detection.detections.get_discovered(config).count()
         context["total_discovered"] = total_discovered
         return context
 
 
-class DetectionsView(TemplateView):
-    template_name = "detections.html"
+def detections_version(request: HttpRequest) -> tuple[str, datetime]:
+    """
+    Cheap version of the recent detections: the newest detection id and the
+    config's last update, both single-row lookups. The current minute is part
+    of the ETag so the relative "last detected" times still refresh.
+    """
+    if not hasattr(request, "detections_version"):
+        config = models.Config.config.get_config()
+        latest = (
+            models.Detection.detections.values_list("id", "created_at")
+            .order_by("-id")
+            .first()
+        )
+        latest_id, latest_at = latest or (0, config.updated_at)
+        minute = int(arrow.now().timestamp() // 60)
+        request.detections_version = (  # type: ignore[attr-defined]
+            f"{latest_id}-{config.updated_at.timestamp()}-{minute}",
+            max(latest_at, config.updated_at),
+        )
+    return request.detections_version  # type: ignore[attr-defined]
+
+
+@method_decorator(cache_control(no_cache=True), name="get")
+@method_decorator(
+    condition(
+        etag_func=lambda request: detections_version(request)[0],
+        last_modified_func=lambda request: detections_version(request)[1],
+    ),
+    name="get",
+)
+class DetectionsView(HomeView):
+    """
+    Polled refresh of the recent days, which also updates the discovered count.
+    Answers conditional requests with 304 while nothing changed, so idle
+    dashboards do not re-run the listing queries.
+    """
+
+    template_name = "partials/recent_detections.html"
+    extra_context = {"oob": True}
+
+
+class OlderDetectionsView(TimedTemplateView):
+    """
+    One page of detections older than the recent days, loaded on scroll.
+    """
+
+    template_name = "partials/older_detections.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         config = models.Config.config.get_config()
-        context["detections"] = models.Detection.detections.get_valid(config)
-        context["total_discovered"] = models.Detection.detections.get_discovered(
-            config
-        ).count()
+        until = parse_date(self.request.GET.get("until"), arrow.now().date())
+        detections = models.Detection.detections.get_valid(
+            config,
+            until=until,
+            before=parse_cursor(self.request.GET.get("before")),
+            limit=PAGE_SIZE,
+        )
+        context["detections"] = detections
+        context["continued_date"] = self.request.GET.get("day")
+        if sum(len(species) for species in detections.values()) == PAGE_SIZE:
+            context["older_url"] = older_detections_url(until, detections)
         return context
 
 
@@ -43,10 +192,13 @@ class SettingsView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         config = models.Config.config.get_config()
+        manual = config.location if config.location.get("source") == "manual" else {}
         context["config_form"] = forms.SettingsForm(
             data={
                 "min_location_confidence": config.min_location_confidence,
                 "min_audio_confidence": config.min_audio_confidence,
+                "latitude": manual.get("lat"),
+                "longitude": manual.get("lon"),
             }
         )
         return context
@@ -60,6 +212,19 @@ class SettingsView(TemplateView):
             config.min_location_confidence = form.cleaned_data[
                 "min_location_confidence"
             ]
+
+            latitude = form.cleaned_data["latitude"]
+            longitude = form.cleaned_data["longitude"]
+            if latitude is not None and longitude is not None:
+                config.location = {
+                    "lat": latitude,
+                    "lon": longitude,
+                    "source": "manual",
+                }
+            elif config.location.get("source") == "manual":
+                # Cleared the coordinates, locate the node from its IP again
+                config.location = {}
+
             config.save()
             return redirect("settings-view")
 
@@ -73,16 +238,72 @@ service_state = {
     "recorder": arrow.now().timestamp(),
 }
 
+# Detections waiting in each service's local spool, reported with its heartbeat
+spool_depth = {
+    "analyzer": 0,
+    "recorder": 0,
+}
+
+
+# Latest metrics snapshot sent with each service's heartbeat
+service_metrics: dict[str, metrics.Registry] = {}
+
+
+def record_spool_depth(request: HttpRequest, service: str):
+    try:
+        spool_depth[service] = int(request.GET["spool_depth"])
+    except (KeyError, ValueError):
+        pass
+
+
+def record_metrics(request: HttpRequest, service: str):
+    if "metrics" not in request.GET:
+        return
+    registry = metrics.Registry()
+    try:
+        registry.merge(json.loads(request.GET["metrics"]))
+    except (KeyError, TypeError, ValueError):
+        return
+    service_metrics[service] = registry
+
+
+def get_healthcheck() -> dict:
+    now = arrow.now().timestamp()
+    healthcheck = {
+        "recorder": not (now - service_state["recorder"] > 30),
+        "analyzer": not (now - service_state["analyzer"] > 30),
+    }
+    return {
+        "healthcheck": healthcheck,
+        "spool_depth": sum(spool_depth.values()),
+    }
+
+
+# Last health pushed to event streams, so only changes are published
+published_health: dict = {}
+
+
+def publish_health():
+    health = get_healthcheck()
+    if health != published_health:
+        published_health.update(health)
+        events.broker.publish("health", health)
+
 
 def analyzer_heartbeat(request: HttpRequest):
     if request.method == "GET":
         service_state["analyzer"] = arrow.now().timestamp()
+        record_spool_depth(request, "analyzer")
+        record_metrics(request, "analyzer")
+        publish_health()
     return HttpResponse(status=204)
 
 
 def recorder_heartbeat(request: HttpRequest):
     if request.method == "GET":
         service_state["recorder"] = arrow.now().timestamp()
+        record_spool_depth(request, "recorder")
+        publish_health()
     return HttpResponse(status=204)
 
 
@@ -90,16 +311,80 @@ class HealthcheckView(TemplateView):
     template_name = "partials/healthcheck.html"
 
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-
-        now = arrow.now().timestamp()
-        healthcheck = {
-            "recorder": not (now - service_state["recorder"] > 30),
-            "analyzer": not (now - service_state["analyzer"] > 30),
-        }
-        context = {"healthcheck": healthcheck}
-
-        return context
+        return get_healthcheck()
+
+
+def metrics_view(request: HttpRequest):
+    """
+    This process's metrics and the ones services sent with their last
+    heartbeat, in the Prometheus text format.
+    """
+    if request.method != "GET":
+        return HttpResponse(status=405)
+
+    now = arrow.now().timestamp()
+    for service, seen in service_state.items():
+        SERVICE_HEARTBEAT_AGE.set(now - seen, service=service)
+        SERVICE_SPOOL_DEPTH.set(spool_depth[service], service=service)
+    body = metrics.REGISTRY.render() + "".join(
+        registry.render() for registry in list(service_metrics.values())
+    )
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Seconds between keepalive comments on idle event streams. Services going
+# down are noticed on these ticks, as there is no heartbeat to publish them.
+KEEPALIVE_SECONDS = 15
+
+
+def event_stream():
+    subscription = events.broker.subscribe()
+    try:
+        yield ": connected\n\n"
+        while True:
+            event = subscription.get(KEEPALIVE_SECONDS)
+            if event is None:
+                publish_health()
+                yield ": keepalive\n\n"
+            else:
+                yield events.format_event(*event)
+    finally:
+        events.broker.unsubscribe(subscription)
+
+
+async def async_event_stream():
+    subscription = events.broker.subscribe_async(asyncio.get_running_loop())
+    try:
+        yield ": connected\n\n"
+        while True:
+            event = await subscription.aget(KEEPALIVE_SECONDS)
+            if event is None:
+                publish_health()
+                yield ": keepalive\n\n"
+            else:
+                yield events.format_event(*event)
+    finally:
+        events.broker.unsubscribe(subscription)
+
+
+def event_stream_view(request: HttpRequest):
+    """
+    Server-sent events for new detections and service health changes.
+
+    Served from the event loop under ASGI. The WSGI dev server holds one
+    thread per connected browser instead.
+    """
+    if request.method != "GET":
+        return HttpResponse(status=405)
+
+    stream = (
+        async_event_stream() if isinstance(request, ASGIRequest) else event_stream()
+    )
+    return StreamingHttpResponse(
+        stream,
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @ensure_csrf_cookie
@@ -107,11 +392,8 @@ def get_config(request):
     if request.method == "GET":
         config = models.Config.config.get_config()
 
-        # Best attempt to update location
-        try:
-            services.update_location(config)
-        except Exception as e:  # pylint: disable=broad-exception-caught
-            logger.exception(e)
+        # Locating the node calls external services, never wait for it here
+        services.location_service.refresh_in_background(config)
 
         payload = model_to_dict(config)
         return JsonResponse(payload)
@@ -127,28 +409,118 @@ def create_detections(request):
                     {"error": "Expected array of detections"}, status=400
                 )
 
-            detections = []
-            for item in data:
-                try:
-                    detections.append(
-                        models.Detection(
-                            recording_start=item["recording_start"],
-                            recording_end=item["recording_end"],
-                            interval=item["interval"],
-                            scientific_name=item["scientific_name"],
-                            common_name=item["common_name"],
-                            audio_confidence=item["audio_confidence"],
-                            location_confidence=item["location_confidence"],
-                            location=item["location"],
-                        )
-                    )
-                except KeyError as e:
-                    return JsonResponse(
-                        {"error": f"Missing required field: {str(e)}"}, status=400
-                    )
-
-            models.Detection.detections.bulk_create(detections)
+            try:
+                detections = models.Detection.detections.from_payloads(data)
+            except KeyError as e:
+                return JsonResponse(
+                    {"error": f"Missing required field: {str(e)}"}, status=400
+                )
+            except ValueError:
+                return JsonResponse({"error": "Invalid interval"}, status=400)
+
+            with INGEST_SECONDS.time(endpoint="detections"):
+                models.Detection.detections.create_batch(detections)
+            INGEST_ROWS.inc(len(detections), endpoint="detections")
+            INGEST_BATCHES.observe(len(detections), endpoint="detections")
+            events.broker.publish(
+                "detections",
+                {
+                    "count": len(detections),
+                    "species": sorted({item["common_name"] for item in data}),
+                },
+            )
             return HttpResponse(status=204)
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON data"}, status=400)
     return HttpResponse(status=405)  # Method Not Allowed
+
+
+def parse_ndjson_detections(lines):
+    """
+    Parse detections from NDJSON one line at a time. A line is either a
+    detection object, or an array of values for the fields named by the last
+    `{"columns": [...]}` line. Yields (line number, payload, errors) with
+    either the validated payload or the errors set.
+    """
+    columns = None
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield number, None, {"__all__": ["Invalid JSON"]}
+            continue
+
+        if isinstance(item, dict) and isinstance(item.get("columns"), list):
+            columns = item["columns"]
+            continue
+        if isinstance(item, list):
+            if columns is None or len(item) != len(columns):
+                yield number, None, {"__all__": ["Row does not match the columns"]}
+                continue
+            item = dict(zip(columns, item))
+        if not isinstance(item, dict):
+            yield number, None, {"__all__": ["Expected an object or an array"]}
+            continue
+
+        form = forms.DetectionForm(item)
+        if not form.is_valid():
+            yield number, None, {
+                field: list(messages) for field, messages in form.errors.items()
+            }
+            continue
+        yield number, form.cleaned_data, None
+
+
+def bulk_create_detections(request):
+    """
+    Streams NDJSON detections into the database in batches of
+    INGEST_BATCH_SIZE. Detections already stored are skipped, so uploads can
+    be retried, and invalid lines are reported back instead of failing the
+    whole upload.
+    """
+    if request.method != "POST":
+        return HttpResponse(status=405)  # Method Not Allowed
+    if request.content_type not in NDJSON_CONTENT_TYPES:
+        return JsonResponse({"error": "Expected application/x-ndjson"}, status=415)
+
+    report = {"created": 0, "duplicates": 0, "error_count": 0, "errors": []}
+    species: set[str] = set()
+    batch: list[dict] = []
+
+    def save():
+        detections = models.Detection.detections.from_payloads(batch)
+        created, duplicates = models.Detection.detections.create_new(detections)
+        report["created"] += len(created)
+        report["duplicates"] += duplicates
+        common_names = {
+            d.species_id: item["common_name"] for d, item in zip(detections, batch)
+        }
+        species.update(common_names[d.species_id] for d in created)
+        batch.clear()
+
+    with INGEST_SECONDS.time(endpoint="bulk"):
+        for number, item, errors in parse_ndjson_detections(request):
+            if errors is not None:
+                report["error_count"] += 1
+                if len(report["errors"]) < MAX_INGEST_ERRORS:
+                    report["errors"].append({"line": number, "errors": errors})
+                continue
+
+            batch.append(item)
+            if len(batch) >= INGEST_BATCH_SIZE:
+                save()
+        if batch:
+            save()
+    INGEST_ROWS.inc(report["created"], endpoint="bulk")
+    INGEST_BATCHES.observe(
+        report["created"] + report["duplicates"] + report["error_count"],
+        endpoint="bulk",
+    )
+
+    if report["created"]:
+        events.broker.publish(
+            "detections", {"count": report["created"], "species": sorted(species)}
+        )
+    return JsonResponse(report)